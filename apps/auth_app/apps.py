@@ -1,6 +1,16 @@
 from django.apps import AppConfig
+from django.conf import settings
+
+from core.caches import require_shared_cache
 
 
 class AuthConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'apps.auth_app'
+
+    def ready(self):
+        import apps.auth_app.signals
+
+        # With a per-process generation key a revoked token stays valid on other workers until their rebuild
+        if settings.TOKEN_BLACKLIST_FILTER_ENABLED:
+            require_shared_cache(settings.TOKEN_BLACKLIST_FILTER_CACHE_ALIAS, "TOKEN_BLACKLIST_FILTER_CACHE_ALIAS")
@@ -2,6 +2,8 @@
 from django.contrib.auth import get_user_model
 from django.core.validators import RegexValidator
 
+from core.hashers import set_password
+
 User = get_user_model()
 
 password_validator = RegexValidator(
@@ -25,7 +27,7 @@ class RegisterRequestSerializer(serializers.ModelSerializer):
             username=validated_data['username'],
             email=validated_data['email']
         )
-        user.set_password(validated_data['password'])
+        set_password(user, validated_data['password'])
         user.save()
         return user
 
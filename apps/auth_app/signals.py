@@ -0,0 +1,27 @@
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken
+
+from core.authentication import user_cache
+from core.tokens import blacklist_filter
+
+User = get_user_model()
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_cached_user(sender, instance, **kwargs):
+    user_id = getattr(instance, api_settings.USER_ID_FIELD)
+    user_cache.invalidate(user_id)
+    # A request racing the open transaction can re-cache the old row; drop it again once committed
+    transaction.on_commit(lambda: user_cache.invalidate(user_id))
+
+
+@receiver(post_save, sender=BlacklistedToken)
+def add_token_to_blacklist_filter(sender, instance, created, **kwargs):
+    # Deleted rows only leave false positives behind until the periodic rebuild, so only inserts bump
+    if created:
+        transaction.on_commit(blacklist_filter.invalidate)
@@ -1,3 +1,308 @@
-from django.test import TestCase
+import os
+import tempfile
+import threading
+import time
+from types import SimpleNamespace
+from unittest import mock
 
-# Create your tests here.
+from django.apps import apps
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.core.exceptions import ImproperlyConfigured
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.exceptions import Throttled
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+from rest_framework_simplejwt.tokens import RefreshToken
+
+import core.hashers
+import core.throttling
+from core.authentication import user_cache
+from core.throttling import password_check_slot, throttle_store
+from core.tokens import BlacklistFilter, BloomFilter, blacklist_filter
+
+# Stands in for a cache shared between workers, e.g. Redis
+SHARED_CACHES = {
+    **settings.CACHES,
+    "shared": {
+        "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+        "LOCATION": tempfile.mkdtemp(),
+    },
+}
+
+THROTTLE_DB = os.path.join(tempfile.mkdtemp(), "throttle.sqlite3")
+
+
+@override_settings(SECURE_SSL_REDIRECT=False)
+class AuthTestCase(TestCase):
+    def setUp(self):
+        user_cache.clear()
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            username="author", email="author@example.com", password="pass12345"
+        )
+
+    def refresh(self, token):
+        return self.client.post("/auth/refresh/", {"refresh": token}, format="json")
+
+    def logout(self, token):
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.post("/auth/logout/", {"refresh": token}, format="json")
+
+
+class LogoutTests(AuthTestCase):
+    def test_refresh_after_logout_is_rejected(self):
+        token = str(RefreshToken.for_user(self.user))
+        self.assertEqual(self.refresh(token).status_code, 200)
+        self.assertEqual(self.logout(token).status_code, 200)
+        self.assertEqual(self.refresh(token).status_code, 400)
+        self.assertEqual(self.logout(token).status_code, 400)
+
+
+@override_settings(
+    TOKEN_BLACKLIST_FILTER_ENABLED=True, CACHES=SHARED_CACHES, TOKEN_BLACKLIST_FILTER_CACHE_ALIAS="shared"
+)
+class BlacklistFilterTests(AuthTestCase):
+    def setUp(self):
+        super().setUp()
+        caches["shared"].clear()
+        blacklist_filter._filter = None
+
+    def test_refresh_skips_blacklist_query(self):
+        token = str(RefreshToken.for_user(self.user))
+        self.assertEqual(self.refresh(token).status_code, 200)
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.refresh(token).status_code, 200)
+        self.assertEqual(len(queries), 0)
+
+    def test_refresh_after_logout_is_rejected(self):
+        token = str(RefreshToken.for_user(self.user))
+        other = str(RefreshToken.for_user(self.user))
+        self.assertEqual(self.refresh(token).status_code, 200)
+
+        self.assertEqual(self.logout(token).status_code, 200)
+
+        self.assertEqual(self.refresh(token).status_code, 400)
+        self.assertEqual(self.refresh(other).status_code, 200)
+
+    def test_filter_built_in_another_process_sees_logout(self):
+        token = str(RefreshToken.for_user(self.user))
+        jti = RefreshToken(token)["jti"]
+        # A second filter shares nothing with this process but the cache, like another worker
+        worker = BlacklistFilter()
+        self.assertFalse(worker.might_contain(jti))
+
+        self.assertEqual(self.logout(token).status_code, 200)
+
+        with self.settings(TOKEN_BLACKLIST_FILTER_REFRESH_SECONDS=3600):
+            self.assertTrue(worker.might_contain(jti))
+
+    def blacklist(self, count, **kwargs):
+        tokens = [RefreshToken.for_user(self.user) for _ in range(count)]
+        outstanding = OutstandingToken.objects.filter(jti__in=[token["jti"] for token in tokens])
+        BlacklistedToken.objects.bulk_create(BlacklistedToken(token=token, **kwargs) for token in outstanding)
+        blacklist_filter.invalidate()
+        return [token["jti"] for token in tokens]
+
+    def test_logout_loads_only_new_rows(self):
+        old_jti = self.blacklist(1)[0]
+        worker = BlacklistFilter()
+        self.assertTrue(worker.might_contain(old_jti))
+
+        token = RefreshToken.for_user(self.user)
+        self.assertEqual(self.logout(str(token)).status_code, 200)
+
+        with CaptureQueriesContext(connection) as queries:
+            self.assertTrue(worker.might_contain(token["jti"]))
+        self.assertEqual(len(queries), 1)
+        self.assertNotIn("expires_at", queries[0]["sql"])
+        self.assertTrue(worker.might_contain(old_jti))
+
+    def test_row_committed_behind_the_last_id_is_loaded(self):
+        worker = BlacklistFilter()
+        self.blacklist(3)
+        worker.might_contain("warm-up")
+        late = BlacklistedToken.objects.order_by("id")[1]
+        late_jti = late.token.jti
+        late.delete()
+        # Same id, as if its insert had committed after the rows around it were loaded
+        BlacklistedToken.objects.create(id=late.id, token=OutstandingToken.objects.get(jti=late_jti))
+        blacklist_filter.invalidate()
+
+        self.assertTrue(worker.might_contain(late_jti))
+
+    def test_full_rebuild_once_capacity_runs_out(self):
+        worker = BlacklistFilter()
+        worker.might_contain("warm-up")
+        capacity = worker._filter.capacity
+
+        jtis = self.blacklist(capacity + 1)
+
+        self.assertTrue(all(worker.might_contain(jti) for jti in jtis))
+        self.assertEqual(worker._filter.capacity, 2 * (capacity + 1))
+
+    def test_process_local_cache_is_rejected(self):
+        for backend in ("locmem.LocMemCache", "dummy.DummyCache"):
+            local = {**SHARED_CACHES, "shared": {"BACKEND": f"django.core.cache.backends.{backend}"}}
+            with self.subTest(backend=backend), override_settings(CACHES=local):
+                with self.assertRaises(ImproperlyConfigured):
+                    apps.get_app_config("auth_app").ready()
+
+    def test_bloom_filter_error_rate(self):
+        bloom = BloomFilter(1000)
+        for i in range(1000):
+            bloom.add(f"member-{i}")
+        self.assertTrue(all(f"member-{i}" in bloom for i in range(1000)))
+        self.assertLess(sum(f"other-{i}" in bloom for i in range(10000)), 300)
+
+
+@override_settings(
+    LOGIN_THROTTLE_DB=THROTTLE_DB,
+    LOGIN_THROTTLE_IP_RATE="5/m",
+    LOGIN_THROTTLE_EMAIL_RATE="3/m",
+    LOGIN_THROTTLE_GLOBAL_RATE="100/m",
+)
+class LoginThrottleTests(AuthTestCase):
+    def setUp(self):
+        super().setUp()
+        if os.path.exists(THROTTLE_DB):
+            os.remove(THROTTLE_DB)
+        throttle_store._local.__dict__.clear()
+        # Pin the clock mid-minute: near a bucket boundary the previous bucket only partly counts
+        now = int(time.time() / 3600) * 3600 + 1830
+        patcher = mock.patch.object(core.throttling, "time", SimpleNamespace(time=lambda: now))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def login(self, email, password="wrong", ip="10.0.0.1", **headers):
+        return self.client.post(
+            "/auth/login/", {"email": email, "password": password}, format="json", REMOTE_ADDR=ip, **headers
+        )
+
+    def test_email_and_ip_limits(self):
+        codes = [self.login("author@example.com").status_code for _ in range(4)]
+        self.assertEqual(codes, [401, 401, 401, 429])
+
+        response = self.login(" Author@example.com", ip="10.0.0.2")
+        self.assertEqual(response.status_code, 429)
+        self.assertGreater(int(response["Retry-After"]), 0)
+
+        self.assertEqual(self.login("first@example.com").status_code, 401)
+        self.assertEqual(self.login("second@example.com").status_code, 429)
+        self.assertEqual(self.login("third@example.com", ip="10.0.0.3").status_code, 401)
+
+    def test_forwarded_for_does_not_reset_ip_limit(self):
+        codes = [
+            self.login(f"user{i}@example.com", HTTP_X_FORWARDED_FOR=f"203.0.113.{i}").status_code
+            for i in range(6)
+        ]
+        self.assertEqual(codes, [401] * 5 + [429])
+
+    def test_forwarded_for_is_used_behind_trusted_proxy(self):
+        rest_framework = {**settings.REST_FRAMEWORK, "NUM_PROXIES": 1}
+        with override_settings(REST_FRAMEWORK=rest_framework):
+            codes = [
+                self.login(f"user{i}@example.com", HTTP_X_FORWARDED_FOR=f"198.51.100.7, 203.0.113.{i}").status_code
+                for i in range(6)
+            ]
+        self.assertEqual(codes, [401] * 6)
+
+    @override_settings(LOGIN_THROTTLE_GLOBAL_RATE="3/m")
+    def test_trusted_pair_skips_email_and_global_limits(self):
+        self.assertEqual(self.login("author@example.com", "pass12345").status_code, 200)
+        for i in range(3):
+            self.login(f"user{i}@example.com", ip=f"10.0.1.{i}")
+        self.assertEqual(self.login("another@example.com", ip="10.0.2.1").status_code, 429)
+
+        self.assertEqual(self.login("author@example.com", "pass12345").status_code, 200)
+        self.assertEqual(self.login("author@example.com", "pass12345", ip="10.0.0.9").status_code, 429)
+
+    def test_sliding_window(self):
+        window, start = 60.0, 6000 * 60.0
+        for _ in range(10):
+            self.assertEqual(throttle_store.hit("key", 10, window, now=start + 1), 0)
+        self.assertAlmostEqual(throttle_store.hit("key", 10, window, now=start + 2), window - 2, places=3)
+
+        # Halfway through the next bucket half of the previous count still applies
+        waits = [throttle_store.hit("key", 10, window, now=start + window * 1.5) for _ in range(6)]
+        self.assertEqual(waits[:5], [0] * 5)
+        self.assertGreater(waits[5], 0)
+        self.assertEqual(throttle_store.hit("key", 10, window, now=start + window * 1.5 + waits[5] + 0.01), 0)
+
+    @override_settings(LOGIN_MAX_CONCURRENT_PASSWORD_CHECKS=1, LOGIN_PASSWORD_CHECK_WAIT_SECONDS=0.1)
+    def test_password_check_slots(self):
+        core.throttling._password_checks = None
+        self.addCleanup(setattr, core.throttling, "_password_checks", None)
+        results = []
+
+        def check():
+            try:
+                with password_check_slot():
+                    results.append("checked")
+            except Throttled:
+                results.append("throttled")
+
+        with password_check_slot():
+            thread = threading.Thread(target=check)
+            thread.start()
+            thread.join()
+        self.assertEqual(results, ["throttled"])
+
+
+@override_settings(LOGIN_THROTTLE_ENABLED=False)
+class PasswordHashingTests(AuthTestCase):
+    def login(self, password):
+        return self.client.post(
+            "/auth/login/", {"email": "author@example.com", "password": password}, format="json"
+        )
+
+    def shut_down_pool(self):
+        if core.hashers._executor is not None:
+            core.hashers._reset_executor(core.hashers._executor)
+
+    def test_register_hashes_with_tuned_hasher(self):
+        response = self.client.post(
+            "/auth/register/",
+            {"username": "newcomer", "email": "newcomer@example.com", "password": "pass12345"},
+            format="json",
+        )
+        self.assertEqual(response.status_code, 200)
+        user = get_user_model().objects.get(username="newcomer")
+        self.assertTrue(user.password.startswith(f"pbkdf2_sha256${settings.PASSWORD_PBKDF2_ITERATIONS}$"))
+        self.assertTrue(user.check_password("pass12345"))
+
+    @override_settings(PASSWORD_HASHING_PROCESSES=1)
+    def test_hashing_round_trips_through_the_pool(self):
+        self.addCleanup(self.shut_down_pool)
+
+        core.hashers.set_password(self.user, "pool12345")
+        self.assertIsNotNone(core.hashers._executor)
+        self.assertTrue(self.user.password.startswith("pbkdf2_sha256$"))
+        self.assertNotIn("pool12345", self.user.password)
+        self.user.save()
+
+        self.user.refresh_from_db()
+        encoded = self.user.password
+        self.assertTrue(core.hashers.check_password(self.user, "pool12345"))
+        self.assertFalse(core.hashers.check_password(self.user, "wrong"))
+        self.assertEqual(self.user.password, encoded)
+        self.assertEqual(self.login("pool12345").status_code, 200)
+        self.assertEqual(self.login("wrong").status_code, 401)
+
+    def test_login_rehashes_with_new_iterations(self):
+        with self.settings(PASSWORD_PBKDF2_ITERATIONS=1000):
+            self.user.set_password("pass12345")
+            self.user.save()
+
+        with self.settings(PASSWORD_PBKDF2_ITERATIONS=2000):
+            self.assertEqual(self.login("wrong").status_code, 401)
+            self.user.refresh_from_db()
+            self.assertTrue(self.user.password.startswith("pbkdf2_sha256$1000$"))
+
+            self.assertEqual(self.login("pass12345").status_code, 200)
+            self.user.refresh_from_db()
+            self.assertTrue(self.user.password.startswith("pbkdf2_sha256$2000$"))
+            self.assertEqual(self.login("pass12345").status_code, 200)
@@ -13,8 +13,12 @@ from apps.auth_app.serializers import RegisterRequestSerializer, LoginRequestSer
     LogoutRequestSerializer
 from apps.auth_app.serializers_response import RegisterResponseSerializer, \
     LoginResponseSerializer, RefreshResponseSerializer
+from core.authentication import get_cached_user
+from core.hashers import check_password
 from core.mixins import ErrorResponseMixin
 from core.serializers import ErrorResponseSerializer
+from core.throttling import LoginRateThrottle, password_check_slot
+from core.tokens import FilteredRefreshToken
 
 User = get_user_model()
 
@@ -59,6 +63,7 @@ class RegisterView(ErrorResponseMixin, APIView):
 
 class LoginView(ErrorResponseMixin, APIView):
     permission_classes = [AllowAny]
+    throttle_classes = [LoginRateThrottle]
 
     @swagger_auto_schema(
         tags=['auth'],
@@ -78,6 +83,10 @@ class LoginView(ErrorResponseMixin, APIView):
                 description="Неверные учетные данные",
                 schema=ErrorResponseSerializer
             ),
+            429: openapi.Response(
+                description="Слишком много попыток входа",
+                schema=ErrorResponseSerializer
+            ),
             500: openapi.Response(
                 description="Внутренняя ошибка сервера",
                 schema=ErrorResponseSerializer
@@ -107,7 +116,10 @@ class LoginView(ErrorResponseMixin, APIView):
                 "User not found"
             )
 
-        if not user.check_password(password):
+        with password_check_slot():
+            password_valid = check_password(user, password)
+
+        if not password_valid:
             return ErrorResponseMixin.format_error(
                 request,
                 status.HTTP_401_UNAUTHORIZED,
@@ -115,6 +127,7 @@ class LoginView(ErrorResponseMixin, APIView):
                 "Invalid email or password"
             )
 
+        LoginRateThrottle().trust(request, email)
         refresh = RefreshToken.for_user(user)
         return Response({
             "access": str(refresh.access_token),
@@ -162,12 +175,10 @@ class RefreshView(ErrorResponseMixin, APIView):
         refresh_token = serializer.validated_data["refresh"]
 
         try:
-            refresh = RefreshToken(refresh_token)
+            refresh = FilteredRefreshToken(refresh_token)
             user_id = refresh.get("user_id")
 
-            try:
-                User.objects.get(id=user_id)
-            except User.DoesNotExist:
+            if get_cached_user(user_id) is None:
                 return ErrorResponseMixin.format_error(
                     request,
                     status.HTTP_404_NOT_FOUND,
@@ -222,7 +233,7 @@ class LogoutView(ErrorResponseMixin, APIView):
         refresh_token = serializer.validated_data["refresh"]
 
         try:
-            token = RefreshToken(refresh_token)
+            token = FilteredRefreshToken(refresh_token)
             token.blacklist()
             return Response({"detail": "Successfully logged out."}, status=status.HTTP_200_OK)
         except TokenError:
@@ -0,0 +1,43 @@
+from django.db import connection, transaction
+
+from apps.post_app.models import ImageBlob
+
+ACQUIRE_SQL = """
+    INSERT INTO {blobs} (name, ref_count) VALUES (%s, 1)
+    ON CONFLICT (name) DO UPDATE SET ref_count = {blobs}.ref_count + 1
+    RETURNING ref_count
+"""
+
+RELEASE_SQL = """
+    UPDATE {blobs} SET ref_count = ref_count - 1
+    WHERE name = %s
+    RETURNING ref_count
+"""
+
+REMOVE_SQL = """
+    DELETE FROM {blobs} WHERE name = %s AND ref_count = 0
+    RETURNING name
+"""
+
+
+def _execute(sql, params):
+    with connection.cursor() as cursor:
+        cursor.execute(sql.format(blobs=ImageBlob._meta.db_table), params)
+        return cursor.fetchone() if cursor.description else None
+
+
+def acquire_image(name):
+    # True for the first reference: the file may be missing or on its way out, so the caller writes it
+    return _execute(ACQUIRE_SQL, [name])[0] == 1
+
+
+def release_image(name, storage):
+    # The file goes under the blob row's lock, so an upload of the same content either keeps it
+    # alive or waits, finds the row gone and writes the file again
+    with transaction.atomic():
+        released = _execute(RELEASE_SQL, [name])
+        if released is None:
+            # Not reference counted (flat storage), the file belongs to this row only
+            storage.delete(name)
+        elif released[0] == 0 and _execute(REMOVE_SQL, [name]) is not None:
+            storage.delete(name)
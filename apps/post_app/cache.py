@@ -0,0 +1,87 @@
+import hashlib
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+
+from core.db_router import replica_reads_active
+
+
+class PostListCache:
+    key_prefix = "posts:list"
+
+    @property
+    def cache(self):
+        return caches[settings.POST_LIST_CACHE_ALIAS]
+
+    @property
+    def generation_key(self):
+        return f"{self.key_prefix}:generation"
+
+    @property
+    def bumped_at_key(self):
+        return f"{self.key_prefix}:bumped_at"
+
+    def is_cacheable(self, request):
+        return settings.POST_LIST_CACHE_ENABLED and not request.user.is_authenticated
+
+    def get_generation(self):
+        generation = self.cache.get(self.generation_key)
+        if generation is None:
+            # Seeded from the clock so an evicted counter never rewinds onto stale entries
+            self.cache.add(self.generation_key, time.time_ns(), timeout=None)
+            generation = self.cache.get(self.generation_key)
+        return generation
+
+    def bump(self):
+        try:
+            self.cache.incr(self.generation_key)
+        except ValueError:
+            self.cache.add(self.generation_key, time.time_ns(), timeout=None)
+        if settings.DATABASE_REPLICAS:
+            self.cache.set(self.bumped_at_key, time.time(), timeout=settings.REPLICA_PIN_SECONDS)
+
+    def make_key(self, request):
+        parts = (request.get_host(), sorted(request.query_params.lists()))
+        digest = hashlib.md5(repr(parts).encode()).hexdigest()
+        return f"{self.key_prefix}:{self.get_generation()}:{digest}"
+
+    def get(self, request):
+        # set() takes the key from here: re-reading the generation after the query would file a page
+        # read before a concurrent write under the generation that write just bumped to
+        if not self.is_cacheable(request):
+            return None, None
+        key = self.make_key(request)
+        data = self.cache.get(key)
+        self._count("hits" if data is not None else "misses")
+        return key, data
+
+    def set(self, key, data):
+        if key is None:
+            return
+        # A replica may not have the write behind the last bump yet; don't pin its view under the new generation
+        if replica_reads_active() and self.cache.get(self.bumped_at_key) is not None:
+            return
+        self.cache.set(key, data, timeout=settings.POST_LIST_CACHE_TIMEOUT)
+
+    async def aget(self, request):
+        return await sync_to_async(self.get)(request)
+
+    async def aset(self, key, data):
+        return await sync_to_async(self.set)(key, data)
+
+    def stats(self):
+        keys = {name: f"{self.key_prefix}:{name}" for name in ("hits", "misses")}
+        values = self.cache.get_many(keys.values())
+        return {name: values.get(key, 0) for name, key in keys.items()}
+
+    def _count(self, name):
+        key = f"{self.key_prefix}:{name}"
+        try:
+            self.cache.incr(key)
+        except ValueError:
+            self.cache.add(key, 1, timeout=None)
+
+
+post_list_cache = PostListCache()
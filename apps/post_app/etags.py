@@ -0,0 +1,72 @@
+import hashlib
+
+from django.db.models import BooleanField, Count, Exists, Max, OuterRef, Value
+
+from apps.post_app.likes import PostLike
+from apps.post_app.models import Post
+
+
+def _digest(state):
+    return hashlib.sha1(repr(state).encode()).hexdigest()
+
+
+def _detail_state(post_id, user):
+    if user.is_authenticated:
+        liked_by_me = Exists(PostLike.objects.filter(post=OuterRef("pk"), user_id=user.id))
+    else:
+        liked_by_me = Value(None, output_field=BooleanField())
+    return (
+        Post.objects.filter(id=post_id)
+        .with_pending_likes()
+        .annotate(
+            image_count=Count("images", distinct=True),
+            last_image_id=Max("images__id"),
+            variant_count=Count("images__variants", distinct=True),
+            last_variant_id=Max("images__variants__id"),
+            liked_by_me=liked_by_me,
+        )
+        .values(
+            "id", "updated_at", "likes_count", "pending_likes", "liked_by_me", "author__username",
+            "image_count", "last_image_id", "variant_count", "last_variant_id",
+        )
+    )
+
+
+def _detail_etag(state):
+    if state is None:
+        return None
+    state["likes_count"] += state.pop("pending_likes")
+    return f'"{_digest(sorted(state.items()))}"'
+
+
+def get_post_detail_etag(post_id, user):
+    return _detail_etag(_detail_state(post_id, user).first())
+
+
+async def aget_post_detail_etag(post_id, user):
+    return _detail_etag(await _detail_state(post_id, user).afirst())
+
+
+def _list_entry(post):
+    if isinstance(post, dict):
+        variants = [variant["id"] for variant in post["thumbnail_variants"]] if post["thumbnail_id"] else None
+        return post["id"], post["likes_count"] + post["pending_likes"], post["thumbnail_id"], variants
+    return (
+        post.id,
+        post.total_likes_count,
+        post.thumbnail_id,
+        [variant.id for variant in post.thumbnail.variants.all()] if post.thumbnail else None,
+    )
+
+
+def get_post_list_etag(paginator, posts, liked_post_ids):
+    page = getattr(paginator, "page", None)
+    state = (
+        max((post["updated_at"] if isinstance(post, dict) else post.updated_at for post in posts), default=None),
+        [_list_entry(post) for post in posts],
+        page.paginator.count if hasattr(page, "paginator") else None,
+        paginator.get_next_link(),
+        paginator.get_previous_link(),
+        sorted(liked_post_ids) if liked_post_ids is not None else None,
+    )
+    return f'W/"{_digest(state)}"'
@@ -0,0 +1,23 @@
+import json
+from itertools import islice
+
+from django.db import transaction
+
+from apps.post_app.models import Post
+from apps.post_app.rendering import POST_EXPORT_FIELDS, render_post_export
+
+
+def iter_post_export(since=None, using="default", chunk_size=1000):
+    posts = Post.objects.using(using).with_pending_likes().values(*POST_EXPORT_FIELDS).order_by("id")
+    if since is not None:
+        posts = posts.filter(updated_at__gt=since)
+
+    # Inside a transaction the server-side cursor is not WITH HOLD, so Postgres streams it
+    # instead of materializing the result, and every line comes from the same snapshot
+    with transaction.atomic(using=using):
+        rows = posts.iterator(chunk_size=chunk_size)
+        while batch := list(islice(rows, chunk_size)):
+            yield "".join(
+                json.dumps(post, ensure_ascii=False, separators=(",", ":")) + "\n"
+                for post in render_post_export(batch, using)
+            ).encode()
@@ -0,0 +1,124 @@
+from django.conf import settings
+from django.db import connection
+
+from apps.post_app.models import Post, PostLikeDelta
+from apps.post_app.trending import refresh_trending_scores
+
+PostLike = Post.likes.through
+
+LIKE_SQL = """
+    WITH inserted AS (
+        INSERT INTO {likes} (post_id, user_id)
+        SELECT id, %s FROM {posts} WHERE id = %s
+        ON CONFLICT (post_id, user_id) DO NOTHING
+        RETURNING post_id
+    )
+    UPDATE {posts} SET likes_count = likes_count + 1
+    WHERE id IN (SELECT post_id FROM inserted)
+    RETURNING likes_count
+"""
+
+UNLIKE_SQL = """
+    WITH deleted AS (
+        DELETE FROM {likes} WHERE post_id = %s AND user_id = %s
+        RETURNING post_id
+    )
+    UPDATE {posts} SET likes_count = likes_count - 1
+    WHERE id IN (SELECT post_id FROM deleted)
+    RETURNING likes_count
+"""
+
+# Write-behind variants append to the delta table instead of touching the post row
+BUFFERED_LIKE_SQL = """
+    WITH inserted AS (
+        INSERT INTO {likes} (post_id, user_id)
+        SELECT id, %s FROM {posts} WHERE id = %s
+        ON CONFLICT (post_id, user_id) DO NOTHING
+        RETURNING post_id
+    )
+    INSERT INTO {deltas} (post_id, delta)
+    SELECT post_id, 1 FROM inserted
+    RETURNING post_id
+"""
+
+BUFFERED_UNLIKE_SQL = """
+    WITH deleted AS (
+        DELETE FROM {likes} WHERE post_id = %s AND user_id = %s
+        RETURNING post_id
+    )
+    INSERT INTO {deltas} (post_id, delta)
+    SELECT post_id, -1 FROM deleted
+    RETURNING post_id
+"""
+
+FLUSH_SQL = """
+    WITH batch AS (
+        DELETE FROM {deltas} WHERE id IN (
+            SELECT id FROM {deltas} ORDER BY id LIMIT %s FOR UPDATE
+        )
+        RETURNING post_id, delta
+    ), totals AS (
+        SELECT post_id, SUM(delta) AS delta FROM batch GROUP BY post_id
+    ), updated AS (
+        UPDATE {posts} SET likes_count = {posts}.likes_count + totals.delta
+        FROM totals WHERE {posts}.id = totals.post_id
+        RETURNING {posts}.id
+    )
+    SELECT (SELECT COUNT(*) FROM batch), ARRAY(SELECT id FROM updated)
+"""
+
+
+def _execute(sql, params):
+    with connection.cursor() as cursor:
+        cursor.execute(sql.format(
+            likes=PostLike._meta.db_table,
+            posts=Post._meta.db_table,
+            deltas=PostLikeDelta._meta.db_table,
+        ), params)
+        return cursor.fetchone()
+
+
+def add_like(post_id, user_id):
+    if settings.POST_LIKES_WRITE_BEHIND:
+        return _execute(BUFFERED_LIKE_SQL, [user_id, post_id]) is not None
+    if _execute(LIKE_SQL, [user_id, post_id]) is None:
+        return False
+    refresh_trending_scores([post_id])
+    return True
+
+
+def remove_like(post_id, user_id):
+    if settings.POST_LIKES_WRITE_BEHIND:
+        return _execute(BUFFERED_UNLIKE_SQL, [post_id, user_id]) is not None
+    if _execute(UNLIKE_SQL, [post_id, user_id]) is None:
+        return False
+    refresh_trending_scores([post_id])
+    return True
+
+
+def get_liked_post_ids(user, post_ids):
+    if not user.is_authenticated:
+        return None
+    if not post_ids:
+        return set()
+    return set(
+        PostLike.objects.filter(user_id=user.id, post_id__in=post_ids).values_list("post_id", flat=True)
+    )
+
+
+async def aget_liked_post_ids(user, post_ids):
+    if not user.is_authenticated:
+        return None
+    if not post_ids:
+        return set()
+    return {
+        post_id
+        async for post_id in PostLike.objects.filter(user_id=user.id, post_id__in=post_ids)
+        .values_list("post_id", flat=True)
+    }
+
+
+def flush_like_deltas(batch_size):
+    flushed, post_ids = _execute(FLUSH_SQL, [batch_size])
+    refresh_trending_scores(post_ids)
+    return flushed, post_ids
@@ -0,0 +1,31 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from apps.post_app.models import Post
+from apps.post_app.trending import prune_trending_scores, refresh_trending_scores
+
+
+class Command(BaseCommand):
+    help = "Recompute time-decayed trending scores for recent posts and drop expired ones"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, batch_size, **options):
+        since = timezone.now() - timedelta(days=settings.TRENDING_WINDOW_DAYS)
+        posts = Post.objects.filter(created_at__gte=since).order_by("id")
+
+        last_id = 0
+        refreshed = 0
+        while True:
+            post_ids = list(posts.filter(id__gt=last_id).values_list("id", flat=True)[:batch_size])
+            if not post_ids:
+                break
+            refreshed += refresh_trending_scores(post_ids)
+            last_id = post_ids[-1]
+
+        pruned = prune_trending_scores()
+        self.stdout.write(f"Refreshed {refreshed} trending scores, pruned {pruned}")
@@ -0,0 +1,32 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from apps.post_app.likes import flush_like_deltas
+
+
+class Command(BaseCommand):
+    help = "Fold buffered like deltas into Post.likes_count (write-behind mode)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=5000)
+        parser.add_argument(
+            "--interval",
+            type=float,
+            default=None,
+            help="Keep running and flush every N seconds instead of exiting once the buffer is empty",
+        )
+
+    def handle(self, *args, batch_size, interval, **options):
+        while True:
+            total = 0
+            while True:
+                flushed, post_ids = flush_like_deltas(batch_size)
+                total += flushed
+                if flushed < batch_size:
+                    break
+            if total or interval is None:
+                self.stdout.write(f"Flushed {total} like deltas")
+            if interval is None:
+                return
+            time.sleep(interval)
@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand
+
+from apps.post_app.models import PostImage
+from apps.post_app.variants import generate_variants
+
+
+class Command(BaseCommand):
+    help = "Generate resized WebP/JPEG variants for post images that do not have them yet"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=500)
+        parser.add_argument(
+            "--all",
+            action="store_true",
+            dest="check_all",
+            help="Check every image for missing variants, not only images without any",
+        )
+
+    def handle(self, *args, batch_size, check_all, **options):
+        images = PostImage.objects.order_by("id")
+        if not check_all:
+            images = images.filter(variants__isnull=True)
+
+        processed = created = 0
+        for post_image in images.iterator(chunk_size=batch_size):
+            try:
+                created += generate_variants(post_image)
+            except (OSError, ValueError) as exc:
+                self.stderr.write(f"Skipping image {post_image.id}: {exc}")
+            processed += 1
+            if processed % batch_size == 0:
+                self.stdout.write(f"Processed {processed} images, created {created} variants")
+
+        self.stdout.write(f"Processed {processed} images, created {created} variants")
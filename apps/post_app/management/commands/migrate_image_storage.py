@@ -0,0 +1,52 @@
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+
+from apps.post_app.blobs import release_image
+from apps.post_app.models import PostImage, PostImageVariant
+from apps.post_app.storage import CONTENT_ADDRESSED_NAME, content_addressed_storage
+
+
+class Command(BaseCommand):
+    help = "Move existing post images and their variants into the content-addressed, sharded storage layout"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=500)
+
+    def handle(self, *args, batch_size, **options):
+        if settings.POST_IMAGE_STORAGE != "content":
+            self.stderr.write("POST_IMAGE_STORAGE is not 'content', new uploads will keep using flat storage")
+
+        self.move(PostImage, "image", "images", batch_size)
+        self.move(PostImageVariant, "file", "variants", batch_size)
+
+    def move(self, model, field_name, label, batch_size):
+        last_id = 0
+        moved = 0
+        while True:
+            batch = list(model.objects.filter(id__gt=last_id).order_by("id")[:batch_size])
+            if not batch:
+                break
+            last_id = batch[-1].id
+
+            old_names = []
+            for instance in batch:
+                old_name = getattr(instance, field_name).name
+                if not old_name or CONTENT_ADDRESSED_NAME.match(old_name):
+                    continue
+                if not default_storage.exists(old_name):
+                    self.stderr.write(f"Skipping {model._meta.model_name} {instance.id}: {old_name} is missing")
+                    continue
+
+                # Saving takes the blob reference; give it back if the file changed or went away meanwhile
+                with default_storage.open(old_name, "rb") as source:
+                    new_name = content_addressed_storage.save(old_name, source)
+                if model.objects.filter(id=instance.id, **{field_name: old_name}).update(**{field_name: new_name}):
+                    old_names.append(old_name)
+                else:
+                    release_image(new_name, content_addressed_storage)
+
+            for old_name in old_names:
+                default_storage.delete(old_name)
+            moved += len(old_names)
+            self.stdout.write(f"Moved {moved} {label} (up to id={last_id})")
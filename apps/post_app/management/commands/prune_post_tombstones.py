@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+
+from apps.post_app.sync import prune_post_tombstones
+
+
+class Command(BaseCommand):
+    help = "Delete post tombstones older than POST_SYNC_TOMBSTONE_RETENTION_DAYS"
+
+    def handle(self, *args, **options):
+        self.stdout.write(f"Pruned {prune_post_tombstones()} post tombstones")
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-18 13:19
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def fill_thumbnails(apps, schema_editor):
+    Post = apps.get_model('post_app', 'Post')
+    PostImage = apps.get_model('post_app', 'PostImage')
+    first_image = PostImage.objects.filter(post=OuterRef('pk')).order_by('id').values('id')[:1]
+    Post.objects.update(thumbnail=Subquery(first_image))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('post_app', '0004_alter_postimage_image_post_post_created_at_id_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='thumbnail',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='post_app.postimage'),
+        ),
+        migrations.RunPython(fill_thumbnails, migrations.RunPython.noop),
+    ]
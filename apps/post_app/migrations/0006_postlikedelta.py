@@ -0,0 +1,22 @@
+# Generated by Django 5.2.18 on 2026-10-18 13:22
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('post_app', '0005_post_thumbnail'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PostLikeDelta',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('delta', models.SmallIntegerField()),
+                ('post', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='like_deltas', to='post_app.post')),
+            ],
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-18 13:27
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('post_app', '0006_postlikedelta'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PostImageVariant',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('width', models.PositiveIntegerField()),
+                ('format', models.CharField(max_length=10)),
+                ('file', models.ImageField(upload_to='variants/')),
+                ('image', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='variants', to='post_app.postimage')),
+            ],
+            options={
+                'ordering': ['width', 'id'],
+                'constraints': [models.UniqueConstraint(fields=('image', 'width', 'format'), name='post_image_variant_unique')],
+            },
+        ),
+    ]
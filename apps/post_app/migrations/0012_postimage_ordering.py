@@ -0,0 +1,17 @@
+# Generated by Django 5.2.18 on 2026-10-18 13:40
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('post_app', '0011_posttrendingscore'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='postimage',
+            options={'ordering': ['id']},
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-18 14:37
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('post_app', '0014_post_tombstone_updated_at_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['author', 'likes_count', 'id'], name='post_author_likes_count_id_idx'),
+        ),
+    ]
@@ -0,0 +1,42 @@
+from django.db import migrations
+from django.db.models import Case, F, TextField, Value, When
+from django.db.models.functions import Concat, Left, Length
+from django.db.models.lookups import GreaterThan
+
+PREVIEW_LENGTH = 200
+BATCH_SIZE = 1000
+
+
+def fill_preview_text(apps, schema_editor):
+    Post = apps.get_model('post_app', 'Post')
+    # Same result as make_preview_text, computed in Postgres so the full text never leaves the DB
+    preview = Case(
+        When(
+            GreaterThan(Length('text'), PREVIEW_LENGTH),
+            then=Concat(Left('text', PREVIEW_LENGTH), Value('...'), output_field=TextField()),
+        ),
+        default=F('text'),
+        output_field=TextField(),
+    )
+    posts = Post.objects.filter(preview_text='').exclude(text='').order_by('id')
+
+    last_id = 0
+    while True:
+        post_ids = list(posts.filter(id__gt=last_id).values_list('id', flat=True)[:BATCH_SIZE])
+        if not post_ids:
+            break
+        Post.objects.filter(id__in=post_ids).update(preview_text=preview)
+        last_id = post_ids[-1]
+
+
+class Migration(migrations.Migration):
+    # Each batch commits on its own instead of locking every post row until the end
+    atomic = False
+
+    dependencies = [
+        ('post_app', '0015_post_author_likes_count_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(fill_preview_text, migrations.RunPython.noop),
+    ]
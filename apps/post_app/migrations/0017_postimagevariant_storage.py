@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-18 16:09
+
+import apps.post_app.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('post_app', '0016_backfill_post_preview_text'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='postimagevariant',
+            name='file',
+            field=models.ImageField(storage=apps.post_app.storage.get_post_image_storage, upload_to='variants/'),
+        ),
+    ]
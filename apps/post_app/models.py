@@ -1,5 +1,46 @@
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVector, SearchVectorField
 from django.db import models
+from django.db.models import OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
 from django.conf import settings
+from django.utils import timezone
+
+from apps.post_app.storage import get_post_image_storage
+
+POST_SEARCH_CONFIG = "russian"
+POST_PREVIEW_LENGTH = 200
+
+
+def make_preview_text(text):
+    return text[:POST_PREVIEW_LENGTH] + "..." if len(text) > POST_PREVIEW_LENGTH else text
+
+
+class PostQuerySet(models.QuerySet):
+    def for_list(self):
+        return (
+            self.with_pending_likes()
+            .defer("text")
+            .select_related("author", "thumbnail")
+            .prefetch_related("thumbnail__variants")
+        )
+
+    def with_pending_likes(self):
+        if not settings.POST_LIKES_WRITE_BEHIND:
+            return self.annotate(pending_likes=models.Value(0))
+        pending = (
+            PostLikeDelta.objects.filter(post=OuterRef("pk"))
+            .values("post")
+            .annotate(total=Sum("delta"))
+            .values("total")
+        )
+        return self.annotate(pending_likes=Coalesce(Subquery(pending), 0))
+
+
+class PostManager(models.Manager.from_queryset(PostQuerySet)):
+    def get_queryset(self):
+        return super().get_queryset().defer("search_vector")
+
 
 class Post(models.Model):
     author = models.ForeignKey(
@@ -9,22 +50,118 @@ class Post(models.Model):
     )
     title = models.CharField(max_length=255)
     text = models.TextField()
+    preview_text = models.CharField(max_length=POST_PREVIEW_LENGTH + 3, blank=True, default="")
     likes_count = models.PositiveIntegerField(default=0)
     likes = models.ManyToManyField(
         settings.AUTH_USER_MODEL,
         related_name="liked_posts",
         blank=True
     )
+    thumbnail = models.ForeignKey(
+        "PostImage",
+        on_delete=models.SET_NULL,
+        related_name="+",
+        null=True,
+        blank=True
+    )
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+    search_vector = models.GeneratedField(
+        expression=(
+            SearchVector("title", weight="A", config=POST_SEARCH_CONFIG)
+            + SearchVector("text", weight="B", config=POST_SEARCH_CONFIG)
+        ),
+        output_field=SearchVectorField(),
+        db_persist=True,
+    )
+
+    objects = PostManager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["created_at", "id"], name="post_created_at_id_idx"),
+            models.Index(fields=["author", "created_at", "id"], name="post_author_created_at_id_idx"),
+            models.Index(fields=["likes_count", "id"], name="post_likes_count_id_idx"),
+            models.Index(fields=["author", "likes_count", "id"], name="post_author_likes_count_id_idx"),
+            models.Index(fields=["updated_at", "id"], name="post_updated_at_id_idx"),
+            GinIndex(fields=["search_vector"], name="post_search_vector_idx"),
+        ]
 
     def __str__(self):
         return f"{self.title} by {self.author.username}"
 
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get("update_fields")
+        if update_fields is None or "text" in update_fields:
+            self.preview_text = make_preview_text(self.text)
+            if update_fields is not None:
+                kwargs["update_fields"] = {*update_fields, "preview_text"}
+        super().save(*args, **kwargs)
+
+    @property
+    def total_likes_count(self):
+        return self.likes_count + getattr(self, "pending_likes", 0)
+
 
 class PostImage(models.Model):
     post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name="images")
-    image = models.ImageField(upload_to="")
+    image = models.ImageField(upload_to="", storage=get_post_image_storage)
+
+    class Meta:
+        ordering = ["id"]
 
     def __str__(self):
         return f"Image for post {self.post.id}"
+
+
+class ImageBlob(models.Model):
+    name = models.CharField(max_length=100, primary_key=True)
+    ref_count = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.name} ({self.ref_count} refs)"
+
+
+class PostImageVariant(models.Model):
+    image = models.ForeignKey(PostImage, on_delete=models.CASCADE, related_name="variants")
+    width = models.PositiveIntegerField()
+    format = models.CharField(max_length=10)
+    file = models.ImageField(upload_to="variants/", storage=get_post_image_storage)
+
+    class Meta:
+        ordering = ["width", "id"]
+        constraints = [
+            models.UniqueConstraint(fields=["image", "width", "format"], name="post_image_variant_unique"),
+        ]
+
+    def __str__(self):
+        return f"{self.format} {self.width}px variant of image {self.image_id}"
+
+
+class PostTrendingScore(models.Model):
+    post = models.OneToOneField(Post, on_delete=models.CASCADE, primary_key=True, related_name="trending")
+    score = models.FloatField()
+    updated_at = models.DateTimeField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["score", "post"], name="post_trending_score_idx"),
+        ]
+
+
+class PostLikeDelta(models.Model):
+    post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name="like_deltas")
+    delta = models.SmallIntegerField()
+
+
+class PostTombstone(models.Model):
+    post_id = models.BigIntegerField()
+    deleted_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["deleted_at", "id"], name="post_tombstone_deleted_at_idx"),
+        ]
+
+    def __str__(self):
+        return f"Post {self.post_id} deleted at {self.deleted_at}"
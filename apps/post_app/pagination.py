@@ -1,6 +1,138 @@
-﻿from rest_framework.pagination import PageNumberPagination
+﻿import json
+
+from django.core.exceptions import ValidationError
+from django.core.paginator import InvalidPage
+from django.db.models import F, Q
+from django.db.models.fields.tuple_lookups import Tuple, TupleGreaterThan, TupleLessThan
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import PageNumberPagination, CursorPagination, Cursor
+
+POST_ORDERING = ("-created_at", "-id")
+TRENDING_ORDERING = ("-score", "-post_id")
+
 
 class PostPagination(PageNumberPagination):
     page_size = 10
     page_size_query_param = "page_size"
     max_page_size = 50
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        page_size = self.get_page_size(request)
+        paginator = self.django_paginator_class(queryset, page_size)
+        paginator.count = await queryset.acount()
+        page_number = self.get_page_number(request, paginator)
+        try:
+            number = paginator.validate_number(page_number)
+        except InvalidPage as exc:
+            raise NotFound(self.invalid_page_message.format(page_number=page_number, message=str(exc)))
+
+        bottom = (number - 1) * page_size
+        results = [obj async for obj in queryset[bottom:bottom + page_size]]
+        self.page = paginator._get_page(results, number, paginator)
+        return results
+
+
+class PostCursorPagination(CursorPagination):
+    page_size = 10
+    page_size_query_param = "page_size"
+    max_page_size = 50
+    ordering = POST_ORDERING
+
+    def paginate_queryset(self, queryset, request, view=None):
+        queryset, reverse, position = self._prepare(queryset, request)
+        return self._set_page(list(queryset), reverse, position)
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        queryset, reverse, position = self._prepare(queryset, request)
+        return self._set_page([obj async for obj in queryset], reverse, position)
+
+    def _prepare(self, queryset, request):
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.page_size = self.get_page_size(request)
+        self.cursor = self.decode_cursor(request)
+
+        reverse = self.cursor is not None and self.cursor.reverse
+        position = self.cursor.position if self.cursor is not None else None
+        ordering = [self._invert(field) for field in self.ordering] if reverse else list(self.ordering)
+
+        queryset = queryset.order_by(*ordering)
+        if position is not None:
+            values = self._decode_position(queryset.model, position)
+            queryset = queryset.filter(self._seek_filter(ordering, values))
+        return queryset[:self.page_size + 1], reverse, position
+
+    def _set_page(self, results, reverse, position):
+        has_more = len(results) > self.page_size
+        self.page = results[:self.page_size]
+
+        if reverse:
+            self.page.reverse()
+            self.has_next, self.has_previous = position is not None, has_more
+        else:
+            self.has_next, self.has_previous = has_more, position is not None
+        return self.page
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        position = self._encode_position(self.page[-1])
+        return self.encode_cursor(Cursor(offset=0, reverse=False, position=position))
+
+    def get_previous_link(self):
+        if not self.has_previous or not self.page:
+            return None
+        position = self._encode_position(self.page[0])
+        return self.encode_cursor(Cursor(offset=0, reverse=True, position=position))
+
+    def _encode_position(self, instance):
+        values = []
+        for field in self.ordering:
+            name = field.lstrip("-")
+            value = instance[name] if isinstance(instance, dict) else getattr(instance, name)
+            values.append(value.isoformat() if hasattr(value, "isoformat") else value)
+        return json.dumps(values, separators=(",", ":"))
+
+    def _decode_position(self, model, position):
+        try:
+            raw_values = json.loads(position)
+            if not isinstance(raw_values, list) or len(raw_values) != len(self.ordering):
+                raise ValueError(position)
+            return [
+                model._meta.get_field(field.lstrip("-")).to_python(value)
+                for field, value in zip(self.ordering, raw_values)
+            ]
+        except (TypeError, ValueError, ValidationError):
+            raise NotFound(self.invalid_cursor_message)
+
+    @staticmethod
+    def _seek_filter(ordering, values):
+        directions = {field.startswith("-") for field in ordering}
+        if len(directions) == 1:
+            # A row comparison is a single Index Cond; the equivalent OR chain below stays a Filter
+            # on the index scan, so deep pages would walk every row before the cursor
+            lookup = TupleLessThan if directions.pop() else TupleGreaterThan
+            return lookup(Tuple(*(F(field.lstrip("-")) for field in ordering)), tuple(values))
+
+        # (a, b) > (x, y)  <=>  a > x OR (a = x AND b > y), per-field direction aware
+        seek = Q()
+        for index, field in enumerate(ordering):
+            lookup = "lt" if field.startswith("-") else "gt"
+            equal = {prev.lstrip("-"): value for prev, value in zip(ordering[:index], values)}
+            seek |= Q(**equal, **{f"{field.lstrip('-')}__{lookup}": values[index]})
+        # The redundant bound on the leading key at least puts that key in the Index Cond
+        lookup = "lte" if ordering[0].startswith("-") else "gte"
+        return Q(**{f"{ordering[0].lstrip('-')}__{lookup}": values[0]}) & seek
+
+    @staticmethod
+    def _invert(field):
+        return field[1:] if field.startswith("-") else f"-{field}"
+
+
+def get_post_paginator(request, ordering=POST_ORDERING):
+    if request.query_params.get("pagination") == "cursor" or "cursor" in request.query_params:
+        paginator = PostCursorPagination()
+        paginator.ordering = ordering
+        return paginator
+    return PostPagination()
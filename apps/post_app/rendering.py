@@ -0,0 +1,130 @@
+from django.utils import timezone
+from django.utils.encoding import filepath_to_uri
+
+from apps.post_app.models import Post, PostImage, PostImageVariant
+
+POST_LIST_FIELDS = (
+    "id", "title", "preview_text", "author__username", "likes_count", "pending_likes",
+    "thumbnail_id", "thumbnail__image", "created_at", "updated_at",
+)
+POST_DETAIL_FIELDS = (
+    "id", "title", "text", "likes_count", "pending_likes", "author_id", "author__username",
+    "created_at", "updated_at",
+)
+POST_EXPORT_FIELDS = (
+    "id", "title", "text", "author_id", "author__username", "likes_count", "pending_likes",
+    "thumbnail_id", "created_at", "updated_at",
+)
+VARIANT_FIELDS = ("id", "image_id", "width", "format", "file")
+
+
+def _media_url(storage):
+    # Same result as storage.url(name), minus the urljoin per call
+    base_url = getattr(storage, "base_url", None)
+    if base_url is None:
+        return lambda name: storage.url(name) if name else None
+    return lambda name: base_url + filepath_to_uri(name).lstrip("/") if name else None
+
+
+def _format_datetime(value):
+    # Mirrors DRF's DateTimeField with the default ISO_8601 format
+    value = timezone.localtime(value).isoformat()
+    return value[:-6] + "Z" if value.endswith("+00:00") else value
+
+
+def _liked_by_me(post_id, liked_post_ids):
+    return post_id in liked_post_ids if liked_post_ids is not None else None
+
+
+def _variants_by_image(image_ids):
+    variants = {image_id: [] for image_id in image_ids}
+    if image_ids:
+        for variant in PostImageVariant.objects.filter(image_id__in=image_ids).values(*VARIANT_FIELDS):
+            variants[variant["image_id"]].append(variant)
+    return variants
+
+
+def _render_variants(variants, variant_url):
+    return [
+        {"width": variant["width"], "format": variant["format"], "url": variant_url(variant["file"])}
+        for variant in variants
+    ]
+
+
+def attach_thumbnail_variants(rows):
+    variants = _variants_by_image([row["thumbnail_id"] for row in rows if row["thumbnail_id"]])
+    for row in rows:
+        row["thumbnail_variants"] = variants.get(row["thumbnail_id"], [])
+    return rows
+
+
+def render_post_list(rows, liked_post_ids):
+    image_url = _media_url(PostImage._meta.get_field("image").storage)
+    variant_url = _media_url(PostImageVariant._meta.get_field("file").storage)
+    return [
+        {
+            "id": row["id"],
+            "title": row["title"],
+            "preview_text": row["preview_text"],
+            "author_username": row["author__username"],
+            "likes_count": row["likes_count"] + row["pending_likes"],
+            "liked_by_me": _liked_by_me(row["id"], liked_post_ids),
+            "thumbnail": image_url(row["thumbnail__image"]) if row["thumbnail_id"] else None,
+            "thumbnail_variants": _render_variants(row["thumbnail_variants"], variant_url),
+            "created_at": _format_datetime(row["created_at"]),
+            "updated_at": _format_datetime(row["updated_at"]),
+        }
+        for row in rows
+    ]
+
+
+def render_post_detail(post_id, liked_post_ids):
+    row = Post.objects.filter(id=post_id).with_pending_likes().values(*POST_DETAIL_FIELDS).first()
+    if row is None:
+        return None
+
+    images = list(PostImage.objects.filter(post_id=post_id).values("id", "image"))
+    variants = _variants_by_image([image["id"] for image in images])
+    image_url = _media_url(PostImage._meta.get_field("image").storage)
+    variant_url = _media_url(PostImageVariant._meta.get_field("file").storage)
+    return {
+        "id": row["id"],
+        "title": row["title"],
+        "text": row["text"],
+        "likes_count": row["likes_count"] + row["pending_likes"],
+        "liked_by_me": _liked_by_me(row["id"], liked_post_ids),
+        "author_id": row["author_id"],
+        "author_username": row["author__username"],
+        "images": [
+            {
+                "id": image["id"],
+                "image": image_url(image["image"]),
+                "variants": _render_variants(variants[image["id"]], variant_url),
+            }
+            for image in images
+        ],
+        "created_at": _format_datetime(row["created_at"]),
+        "updated_at": _format_datetime(row["updated_at"]),
+    }
+
+
+def render_post_export(rows, using=None):
+    image_url = _media_url(PostImage._meta.get_field("image").storage)
+    images = {row["id"]: [] for row in rows}
+    for image in PostImage.objects.using(using).filter(post_id__in=list(images)).values("id", "post_id", "image"):
+        images[image["post_id"]].append({"id": image["id"], "url": image_url(image["image"])})
+    return [
+        {
+            "id": row["id"],
+            "title": row["title"],
+            "text": row["text"],
+            "author_id": row["author_id"],
+            "author_username": row["author__username"],
+            "likes_count": row["likes_count"] + row["pending_likes"],
+            "thumbnail_id": row["thumbnail_id"],
+            "images": images[row["id"]],
+            "created_at": _format_datetime(row["created_at"]),
+            "updated_at": _format_datetime(row["updated_at"]),
+        }
+        for row in rows
+    ]
@@ -1,12 +1,53 @@
 ﻿from rest_framework import serializers
 
-from apps.post_app.models import Post, PostImage
+from apps.post_app.models import Post, PostImage, PostImageVariant
 
 
+class PostImageVariantSerializer(serializers.ModelSerializer):
+    url = serializers.ImageField(source="file", read_only=True)
+
+    class Meta:
+        model = PostImageVariant
+        fields = ["width", "format", "url"]
+
 class PostImageSerializer(serializers.ModelSerializer):
+    variants = PostImageVariantSerializer(many=True, read_only=True)
+
     class Meta:
         model = PostImage
-        fields = ["id", "image"]
+        fields = ["id", "image", "variants"]
+
+class PostListQuerySerializer(serializers.Serializer):
+    author = serializers.IntegerField(required=False, min_value=1)
+    ordering = serializers.ChoiceField(
+        choices=["-created_at", "-likes_count"],
+        required=False,
+        default="-created_at"
+    )
+    created_after = serializers.DateTimeField(required=False)
+    created_before = serializers.DateTimeField(required=False)
+
+    def get_filters(self):
+        filters = {}
+        if "author" in self.validated_data:
+            filters["author_id"] = self.validated_data["author"]
+        if "created_after" in self.validated_data:
+            filters["created_at__gte"] = self.validated_data["created_after"]
+        if "created_before" in self.validated_data:
+            filters["created_at__lt"] = self.validated_data["created_before"]
+        return filters
+
+    # Each filter/ordering pair reads a matching (author, sort key, id) index in order,
+    # except a created_at range with -likes_count, which has to sort the range
+    def get_ordering(self):
+        return self.validated_data["ordering"], "-id"
+
+class PostExportQuerySerializer(serializers.Serializer):
+    since = serializers.DateTimeField(required=False)
+
+class PostChangesQuerySerializer(serializers.Serializer):
+    since = serializers.CharField(required=False)
+    limit = serializers.IntegerField(required=False, min_value=1, max_value=500, default=100)
 
 class CreatePostRequestSerializer(serializers.ModelSerializer):
     images = serializers.ListField(
@@ -29,8 +70,10 @@ class CreatePostRequestSerializer(serializers.ModelSerializer):
     def create(self, validated_data):
         images_data = validated_data.pop("images", [])
         post = Post.objects.create(author=self.context["request"].user, **validated_data)
-        for img in images_data:
-            PostImage.objects.create(post=post, image=img)
+        images = [PostImage.objects.create(post=post, image=img) for img in images_data]
+        if images:
+            post.thumbnail = images[0]
+            post.save(update_fields=["thumbnail", "updated_at"])
         return post
 
     def update(self, instance, validated_data):
@@ -39,17 +82,17 @@ class CreatePostRequestSerializer(serializers.ModelSerializer):
         
         instance.title = validated_data.get("title", instance.title)
         instance.text = validated_data.get("text", instance.text)
-        instance.save()
+        instance.save(update_fields=["title", "text", "updated_at"])
 
         if delete_images:
-            images_to_delete = PostImage.objects.filter(post=instance, id__in=delete_images)
-            for img in images_to_delete:
-                if img.image:
-                    img.image.delete(save=False)
-            images_to_delete.delete()
+            PostImage.objects.filter(post=instance, id__in=delete_images).delete()
         
         if images_data:
             for img in images_data:
                 PostImage.objects.create(post=instance, image=img)
 
+        if delete_images or images_data:
+            instance.thumbnail = instance.images.order_by("id").first()
+            instance.save(update_fields=["thumbnail", "updated_at"])
+
         return instance
\ No newline at end of file
@@ -1,13 +1,22 @@
 ﻿from rest_framework import serializers
 
 from apps.post_app.models import Post
-from apps.post_app.serializers import PostImageSerializer
+from apps.post_app.serializers import PostImageSerializer, PostImageVariantSerializer
 
 
-class PostListResponseSerializer(serializers.ModelSerializer):
+class LikedByMeMixin(serializers.Serializer):
+    liked_by_me = serializers.SerializerMethodField()
+
+    def get_liked_by_me(self, obj):
+        liked_post_ids = self.context.get("liked_post_ids")
+        return obj.id in liked_post_ids if liked_post_ids is not None else None
+
+
+class PostListResponseSerializer(LikedByMeMixin, serializers.ModelSerializer):
     author_username = serializers.CharField(source="author.username", read_only=True)
+    likes_count = serializers.IntegerField(source="total_likes_count", read_only=True)
     thumbnail = serializers.SerializerMethodField()
-    preview_text = serializers.SerializerMethodField()
+    thumbnail_variants = serializers.SerializerMethodField()
 
     class Meta:
         model = Post
@@ -17,21 +26,25 @@ class PostListResponseSerializer(serializers.ModelSerializer):
             "preview_text",
             "author_username", 
             "likes_count", 
+            "liked_by_me",
             "thumbnail", 
+            "thumbnail_variants",
             "created_at", 
             "updated_at"
         ]
 
-    def get_preview_text(self, obj):
-        return obj.text[:200] + "..." if len(obj.text) > 200 else obj.text
-    
     def get_thumbnail(self, obj):
-        first_image = obj.images.first()
-        return first_image.image.url if first_image else None
+        return obj.thumbnail.image.url if obj.thumbnail else None
 
-class PostDetailResponseSerializer(serializers.ModelSerializer):
+    def get_thumbnail_variants(self, obj):
+        if not obj.thumbnail:
+            return []
+        return PostImageVariantSerializer(obj.thumbnail.variants.all(), many=True).data
+
+class PostDetailResponseSerializer(LikedByMeMixin, serializers.ModelSerializer):
     author_id = serializers.IntegerField(source="author.id", read_only=True)
     author_username = serializers.CharField(source="author.username", read_only=True)
+    likes_count = serializers.IntegerField(source="total_likes_count", read_only=True)
     images = PostImageSerializer(many=True, read_only=True)
 
     class Meta:
@@ -41,6 +54,7 @@ class PostDetailResponseSerializer(serializers.ModelSerializer):
             "title",
             "text",
             "likes_count",
+            "liked_by_me",
             "author_id",
             "author_username",
             "images",
@@ -53,3 +67,14 @@ class PaginatedPostListSerializer(serializers.Serializer):
     next = serializers.CharField(allow_null=True)
     previous = serializers.CharField(allow_null=True)
     results = PostListResponseSerializer(many=True)
+
+class CursorPaginatedPostListSerializer(serializers.Serializer):
+    next = serializers.CharField(allow_null=True)
+    previous = serializers.CharField(allow_null=True)
+    results = PostListResponseSerializer(many=True)
+
+class PostChangesResponseSerializer(serializers.Serializer):
+    posts = PostListResponseSerializer(many=True)
+    deleted = serializers.ListField(child=serializers.IntegerField())
+    next = serializers.CharField()
+    has_more = serializers.BooleanField()
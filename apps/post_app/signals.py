@@ -1,13 +1,60 @@
-﻿import os
-
-from django.db.models.signals import pre_delete
+﻿from django.conf import settings
+from django.db import transaction
+from django.db.models.signals import pre_delete, post_delete, post_save
 from django.dispatch import receiver
+from django.utils import timezone
 
-from apps.post_app.models import PostImage
+from apps.post_app.blobs import release_image
+from apps.post_app.cache import post_list_cache
+from apps.post_app.models import Post, PostImage, PostImageVariant, PostTombstone
+from apps.post_app.trending import refresh_trending_scores
+from apps.post_app.variants import schedule_variants
 
 
 @receiver(pre_delete, sender=PostImage)
 def delete_image_file_on_delete(sender, instance, **kwargs):
     if instance.image:
-        if instance.image.path and os.path.isfile(instance.image.path):
-            os.remove(instance.image.path)
+        release_image(instance.image.name, instance.image.storage)
+
+
+@receiver(pre_delete, sender=PostImageVariant)
+def delete_variant_file_on_delete(sender, instance, **kwargs):
+    if instance.file:
+        release_image(instance.file.name, instance.file.storage)
+
+
+@receiver(post_save, sender=PostImage)
+def schedule_variants_on_upload(sender, instance, created, **kwargs):
+    if created and settings.IMAGE_VARIANTS_ENABLED:
+        transaction.on_commit(lambda: schedule_variants(instance.id))
+
+
+@receiver(post_delete, sender=PostImage)
+def reassign_thumbnail_on_delete(sender, instance, origin=None, **kwargs):
+    if isinstance(origin, Post):
+        return
+    next_image = PostImage.objects.filter(post_id=instance.post_id).order_by("id").first()
+    Post.objects.filter(id=instance.post_id, thumbnail__isnull=True).update(
+        thumbnail=next_image, updated_at=timezone.now()
+    )
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+@receiver(post_save, sender=PostImage)
+@receiver(post_delete, sender=PostImage)
+def invalidate_post_list_cache(sender, **kwargs):
+    # Bumping inside the writer's transaction would let a concurrent reader cache the pre-commit rows
+    # under the new generation
+    transaction.on_commit(post_list_cache.bump)
+
+
+@receiver(post_save, sender=Post)
+def score_new_post(sender, instance, created, **kwargs):
+    if created:
+        refresh_trending_scores([instance.id])
+
+
+@receiver(post_delete, sender=Post)
+def record_post_tombstone(sender, instance, **kwargs):
+    PostTombstone.objects.create(post_id=instance.id)
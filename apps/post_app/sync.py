@@ -0,0 +1,98 @@
+import base64
+import binascii
+import json
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import router
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from rest_framework import status
+from rest_framework.exceptions import APIException, ValidationError
+
+from apps.post_app.models import Post, PostTombstone
+from apps.post_app.rendering import POST_LIST_FIELDS
+
+
+class SyncTokenExpired(APIException):
+    status_code = status.HTTP_410_GONE
+    default_detail = "Gone"
+    default_code = "sync_token_expired"
+
+
+def encode_sync_token(post_position, tombstone_position):
+    values = [value for position in (post_position, tombstone_position) for value in position]
+    payload = json.dumps(
+        [value.isoformat() if hasattr(value, "isoformat") else value for value in values], separators=(",", ":")
+    )
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_sync_token(token):
+    try:
+        values = json.loads(base64.urlsafe_b64decode(token + "=" * (-len(token) % 4)))
+        post_at, post_id, tombstone_at, tombstone_id = values
+        post_at, tombstone_at = parse_datetime(post_at), parse_datetime(tombstone_at)
+        if post_at is None or tombstone_at is None or timezone.is_naive(post_at) or timezone.is_naive(tombstone_at):
+            raise ValueError(token)
+        if not all(value is None or isinstance(value, int) for value in (post_id, tombstone_id)):
+            raise ValueError(token)
+    except (TypeError, ValueError, binascii.Error):
+        raise ValidationError({"since": ["Invalid sync token."]})
+    return (post_at, post_id), (tombstone_at, tombstone_id)
+
+
+def _after(field, position):
+    # (field, id) > position; an id of None means every row at that instant was already sent
+    moment, last_id = position
+    if last_id is None:
+        return Q(**{f"{field}__gt": moment})
+    return Q(**{f"{field}__gt": moment}) | Q(**{field: moment, "id__gt": last_id})
+
+
+def _page(queryset, field, position, cutoff, limit):
+    queryset = queryset.filter(**{f"{field}__lte": cutoff}).order_by(field, "id")
+    if position is not None:
+        queryset = queryset.filter(_after(field, position))
+    rows = list(queryset[:limit + 1])
+    if len(rows) > limit:
+        rows = rows[:limit]
+        return rows, (rows[-1][field], rows[-1]["id"]), True
+    # Nothing else up to the cutoff; jump the watermark there so idle clients keep fresh tokens
+    return rows, (cutoff, None), False
+
+
+def get_post_changes(since, limit):
+    now = timezone.now()
+    # Rows stamped just before now may belong to transactions that haven't committed yet
+    cutoff = now - timedelta(seconds=settings.POST_SYNC_SAFETY_LAG_SECONDS)
+    if since is None:
+        post_position, tombstone_position = None, (cutoff, None)
+    else:
+        post_position, tombstone_position = decode_sync_token(since)
+        if tombstone_position[0] < now - timedelta(days=settings.POST_SYNC_TOMBSTONE_RETENTION_DAYS):
+            raise SyncTokenExpired("Sync token is older than the tombstone retention window, run a full sync.")
+
+    # A lagging replica could hide rows that are already behind the cutoff, so read the primary
+    using = router.db_for_write(Post)
+    posts, post_position, more_posts = _page(
+        Post.objects.using(using).with_pending_likes().values(*POST_LIST_FIELDS),
+        "updated_at", post_position, cutoff, limit,
+    )
+    tombstones, tombstone_position, more_tombstones = _page(
+        PostTombstone.objects.using(using).values("id", "post_id", "deleted_at"),
+        "deleted_at", tombstone_position, cutoff, limit,
+    )
+    return {
+        "posts": posts,
+        "deleted": [tombstone["post_id"] for tombstone in tombstones],
+        "next": encode_sync_token(post_position, tombstone_position),
+        "has_more": more_posts or more_tombstones,
+    }
+
+
+def prune_post_tombstones():
+    horizon = timezone.now() - timedelta(days=settings.POST_SYNC_TOMBSTONE_RETENTION_DAYS)
+    deleted, _ = PostTombstone.objects.filter(deleted_at__lt=horizon).delete()
+    return deleted
@@ -1,3 +1,1058 @@
-from django.test import TestCase
+import base64
+import datetime
+import importlib
+import io
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+from unittest import mock, skipUnless
+from urllib.parse import urlencode
 
-# Create your tests here.
+from django.apps import apps as django_apps
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import AnonymousUser
+from django.contrib.postgres.search import SearchQuery, SearchRank
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.cache import caches
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.core.exceptions import ImproperlyConfigured
+from django.db import connection, connections, router
+from django.db.models import F
+from django.test.utils import CaptureQueriesContext
+from django.http import Http404, HttpResponse
+from django.test import RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+from PIL import Image
+from prometheus_client import REGISTRY
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from apps.post_app.blobs import release_image
+from apps.post_app.cache import post_list_cache
+from apps.post_app.likes import add_like, flush_like_deltas, remove_like
+from apps.post_app.models import (
+    POST_PREVIEW_LENGTH, POST_SEARCH_CONFIG, ImageBlob, Post, PostImage, PostImageVariant, PostLikeDelta,
+    PostTrendingScore, make_preview_text,
+)
+from apps.post_app.pagination import POST_ORDERING, TRENDING_ORDERING, PostCursorPagination
+from apps.post_app.rendering import POST_LIST_FIELDS, attach_thumbnail_variants, render_post_detail, render_post_list
+from apps.post_app.serializers import CreatePostRequestSerializer, PostListQuerySerializer
+from apps.post_app.serializers_response import PostDetailResponseSerializer, PostListResponseSerializer
+from apps.post_app.storage import CONTENT_ADDRESSED_NAME, content_addressed_storage
+from apps.post_app.variants import generate_variants
+from core.middleware import ReplicaRoutingMiddleware
+from core.renderers import FastJSONRenderer
+from core.views import metrics_view
+
+MEDIA_ROOT = tempfile.mkdtemp()
+# Replica pins have to be shared between workers, so routing tests use a file-based cache
+PIN_CACHES = {
+    **settings.CACHES,
+    "replica-pins": {
+        "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+        "LOCATION": tempfile.mkdtemp(),
+    },
+}
+
+
+def png_file(name="image.png", color="red"):
+    buffer = io.BytesIO()
+    Image.new("RGB", (900, 400), color).save(buffer, "PNG")
+    return SimpleUploadedFile(name, buffer.getvalue(), content_type="image/png")
+
+
+class ContentAddressedStorageMixin:
+    # File fields resolve their storage once at import, so tests swap it in directly
+    def setUp(self):
+        super().setUp()
+        for field in (PostImage._meta.get_field("image"), PostImageVariant._meta.get_field("file")):
+            self.addCleanup(setattr, field, "storage", field.storage)
+            field.storage = content_addressed_storage
+
+
+@override_settings(SECURE_SSL_REDIRECT=False, MEDIA_ROOT=MEDIA_ROOT)
+class PostTestCase(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        # The cache outlives each test's rollback, and bumps wait for a commit that never comes here
+        post_list_cache.cache.clear()
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            username="author", email="author@example.com", password="pass12345"
+        )
+        self.reader = get_user_model().objects.create_user(
+            username="reader", email="reader@example.com", password="pass12345"
+        )
+
+    def create_post(self, **kwargs):
+        kwargs.setdefault("author", self.user)
+        kwargs.setdefault("title", "Title")
+        kwargs.setdefault("text", "Text")
+        return Post.objects.create(**kwargs)
+
+    def seed_posts(self, count, authors=20):
+        # Plans are only meaningful against a table with statistics, not an empty one
+        authors = get_user_model().objects.bulk_create(
+            get_user_model()(username=f"writer{i}", email=f"writer{i}@example.com") for i in range(authors)
+        )
+        Post.objects.bulk_create(
+            Post(author=authors[i % len(authors)], title=f"Post {i}", text="Text", likes_count=i % 50)
+            for i in range(count)
+        )
+        with connection.cursor() as cursor:
+            cursor.execute(f"ANALYZE {Post._meta.db_table}")
+        return authors
+
+    def create_image(self, post, name="image.png", color="red"):
+        return PostImage.objects.create(post=post, image=png_file(name, color))
+
+    def explain(self, queryset, **options):
+        with connection.cursor() as cursor:
+            cursor.execute("SET LOCAL enable_seqscan = off")
+        return queryset.explain(**options)
+
+    def deep_seek(self, queryset, ordering, remaining=50):
+        # Cursor a few pages from the end, where a filter-only seek reads the most rows
+        keys = list(queryset.order_by(*ordering).values_list(*[field.lstrip("-") for field in ordering]))
+        return PostCursorPagination._seek_filter(ordering, list(keys[-remaining]))
+
+    def assert_index_seek(self, plan, column):
+        # Rows before the cursor have to be skipped by the index, not read and filtered out
+        self.assertRegex(plan, rf"Index Cond: .*\b{column}\b")
+        self.assertNotIn("Rows Removed by Filter", plan)
+
+
+class PostDetailConditionalTests(PostTestCase):
+    def test_if_none_match_returns_not_modified(self):
+        post = self.create_post()
+        etag = self.client.get(f"/posts/{post.id}/")["ETag"]
+
+        response = self.client.get(f"/posts/{post.id}/", HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response["ETag"], etag)
+
+    def test_like_changes_etag(self):
+        post = self.create_post()
+        etag = self.client.get(f"/posts/{post.id}/")["ETag"]
+
+        self.client.force_authenticate(self.reader)
+        self.assertEqual(self.client.post(f"/posts/{post.id}/like/").status_code, 200)
+        self.client.force_authenticate(None)
+
+        response = self.client.get(f"/posts/{post.id}/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["likes_count"], 1)
+
+    def test_if_modified_since_is_not_honored(self):
+        post = self.create_post()
+        response = self.client.get(f"/posts/{post.id}/")
+        self.assertNotIn("Last-Modified", response)
+
+        self.client.force_authenticate(self.reader)
+        self.client.post(f"/posts/{post.id}/like/")
+        self.client.force_authenticate(None)
+
+        response = self.client.get(f"/posts/{post.id}/", HTTP_IF_MODIFIED_SINCE="Fri, 01 Jan 2100 00:00:00 GMT")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["likes_count"], 1)
+
+
+class PostListCacheTests(PostTestCase):
+    def get_ids(self, **params):
+        response = self.client.get("/posts/", params)
+        self.assertEqual(response.status_code, 200)
+        return response["X-Cache"], [post["id"] for post in response.data["results"]]
+
+    def anonymous_request(self):
+        request = Request(RequestFactory().get("/posts/"))
+        request.user = AnonymousUser()
+        return request
+
+    def test_anonymous_pages_are_cached_per_query(self):
+        post = self.create_post()
+
+        self.assertEqual(self.get_ids(), ("MISS", [post.id]))
+        self.assertEqual(self.get_ids(), ("HIT", [post.id]))
+        self.assertEqual(self.get_ids(page_size=1), ("MISS", [post.id]))
+        self.assertEqual(post_list_cache.stats(), {"hits": 1, "misses": 2})
+
+    def test_authenticated_requests_skip_the_cache(self):
+        self.create_post()
+        self.client.force_authenticate(self.reader)
+
+        self.assertEqual(self.get_ids()[0], "MISS")
+        self.assertEqual(self.get_ids()[0], "MISS")
+        self.assertEqual(post_list_cache.stats(), {"hits": 0, "misses": 0})
+
+    def test_writes_invalidate_the_cache(self):
+        post = self.create_post()
+        self.get_ids()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            created = self.create_post(title="New")
+        self.assertEqual(self.get_ids(), ("MISS", [created.id, post.id]))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            post.title = "Edited"
+            post.save()
+        response = self.client.get("/posts/")
+        self.assertEqual((response["X-Cache"], response.data["results"][1]["title"]), ("MISS", "Edited"))
+
+        self.client.force_authenticate(self.reader)
+        self.assertEqual(self.client.post(f"/posts/{post.id}/like/").status_code, 200)
+        self.client.force_authenticate(None)
+        response = self.client.get("/posts/")
+        self.assertEqual((response["X-Cache"], response.data["results"][1]["likes_count"]), ("MISS", 1))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            created.delete()
+        self.assertEqual(self.get_ids(), ("MISS", [post.id]))
+
+    def test_bump_waits_for_commit(self):
+        generation = post_list_cache.get_generation()
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.create_post()
+        self.assertEqual(post_list_cache.get_generation(), generation)
+
+        for callback in callbacks:
+            callback()
+        self.assertNotEqual(post_list_cache.get_generation(), generation)
+
+    def test_page_read_before_a_bump_is_not_served_after_it(self):
+        key, cached = post_list_cache.get(self.anonymous_request())
+        self.assertIsNone(cached)
+
+        post_list_cache.bump()
+        post_list_cache.set(key, ("stale", '"etag"'))
+
+        self.assertIsNone(post_list_cache.get(self.anonymous_request())[1])
+
+
+@override_settings(IMAGE_VARIANTS_ENABLED=False)
+class ContentAddressedStorageTests(ContentAddressedStorageMixin, PostTestCase):
+    def ref_count(self, name):
+        return ImageBlob.objects.filter(name=name).values_list("ref_count", flat=True).first()
+
+    def test_identical_uploads_share_one_file(self):
+        first = self.create_image(self.create_post(), "first.png")
+        second = self.create_image(self.create_post(), "second.png")
+        other = self.create_image(self.create_post(), "other.png", color="blue")
+
+        self.assertRegex(first.image.name, CONTENT_ADDRESSED_NAME)
+        self.assertEqual(first.image.name, second.image.name)
+        self.assertNotEqual(first.image.name, other.image.name)
+        self.assertEqual(os.listdir(os.path.dirname(first.image.path)), [os.path.basename(first.image.name)])
+        self.assertEqual((self.ref_count(first.image.name), self.ref_count(other.image.name)), (2, 1))
+
+    def test_file_is_deleted_with_the_last_reference(self):
+        first = self.create_image(self.create_post())
+        second_post = self.create_post()
+        second = self.create_image(second_post)
+        name, path = first.image.name, first.image.path
+
+        first.delete()
+        self.assertTrue(os.path.isfile(path))
+        self.assertEqual(self.ref_count(name), 1)
+
+        second_post.delete()
+        self.assertFalse(os.path.exists(path))
+        self.assertIsNone(self.ref_count(second.image.name))
+
+    def test_upload_writes_a_referenced_file_that_went_missing(self):
+        first = self.create_image(self.create_post())
+        os.remove(first.image.path)
+
+        second = self.create_image(self.create_post())
+
+        self.assertTrue(os.path.isfile(second.image.path))
+        self.assertEqual(self.ref_count(second.image.name), 2)
+
+    def test_identical_images_share_variant_files(self):
+        first = self.create_image(self.create_post(), "first.png")
+        second = self.create_image(self.create_post(), "second.png")
+        generate_variants(first)
+        generate_variants(second)
+
+        names = list(first.variants.values_list("file", flat=True))
+        self.assertEqual(len(names), 4)
+        self.assertTrue(all(CONTENT_ADDRESSED_NAME.match(name) for name in names))
+        self.assertEqual(list(second.variants.values_list("file", flat=True)), names)
+        self.assertEqual({self.ref_count(name) for name in names}, {2})
+
+        first.post.delete()
+        self.assertEqual({self.ref_count(name) for name in names}, {1})
+        self.assertTrue(all(content_addressed_storage.exists(name) for name in names))
+
+        second.post.delete()
+        self.assertEqual({self.ref_count(name) for name in names}, {None})
+        self.assertFalse(any(content_addressed_storage.exists(name) for name in names))
+
+    def test_migrate_image_storage_moves_flat_files(self):
+        fields = (PostImage._meta.get_field("image"), PostImageVariant._meta.get_field("file"))
+        for field in fields:
+            field.storage = default_storage
+        images = [
+            self.create_image(self.create_post(), name, color)
+            for name, color in (("a.png", "red"), ("b.png", "red"), ("c.png", "blue"))
+        ]
+        generate_variants(images[0])
+        flat_variants = list(PostImageVariant.objects.values_list("file", flat=True))
+        self.assertTrue(all(name.startswith("variants/") for name in flat_variants))
+        for field in fields:
+            field.storage = content_addressed_storage
+        flat_names = [image.image.name for image in images]
+
+        call_command("migrate_image_storage", stdout=io.StringIO(), stderr=io.StringIO())
+
+        names = [image.image.name for image in PostImage.objects.order_by("id")]
+        self.assertTrue(all(CONTENT_ADDRESSED_NAME.match(name) for name in names))
+        self.assertEqual(names[0], names[1])
+        self.assertNotEqual(names[0], names[2])
+        self.assertEqual((self.ref_count(names[0]), self.ref_count(names[2])), (2, 1))
+        self.assertTrue(all(content_addressed_storage.exists(name) for name in names))
+        self.assertFalse(any(default_storage.exists(name) for name in flat_names))
+
+        variants = list(PostImageVariant.objects.values_list("file", flat=True))
+        self.assertTrue(all(CONTENT_ADDRESSED_NAME.match(name) for name in variants))
+        self.assertEqual({self.ref_count(name) for name in variants}, {1})
+        self.assertFalse(any(default_storage.exists(name) for name in flat_variants))
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT, IMAGE_VARIANTS_ENABLED=False)
+class ContentAddressedReleaseRaceTests(ContentAddressedStorageMixin, TransactionTestCase):
+    def test_upload_during_the_last_release_keeps_the_file(self):
+        author = get_user_model().objects.create_user(username="author", email="author@example.com", password="x")
+        image = PostImage.objects.create(post=Post.objects.create(author=author, title="A", text="A"), image=png_file())
+        second_post = Post.objects.create(author=author, title="B", text="B")
+        deleting, resume, uploaded, errors = threading.Event(), threading.Event(), [], []
+
+        class PausingStorage:
+            # Holds the release transaction open right before the file goes
+            def delete(self, name):
+                deleting.set()
+                resume.wait(5)
+                content_addressed_storage.delete(name)
+
+        def release():
+            try:
+                release_image(image.image.name, PausingStorage())
+            finally:
+                connection.close()
+
+        def upload():
+            try:
+                uploaded.append(PostImage.objects.create(post=second_post, image=png_file()))
+            except Exception as exc:
+                errors.append(exc)
+            finally:
+                connection.close()
+
+        releaser, uploader = threading.Thread(target=release), threading.Thread(target=upload)
+        releaser.start()
+        self.assertTrue(deleting.wait(5))
+        uploader.start()
+        time.sleep(0.3)
+        resume.set()
+        releaser.join()
+        uploader.join()
+
+        self.assertEqual(errors, [])
+        self.assertEqual(uploaded[0].image.name, image.image.name)
+        self.assertTrue(content_addressed_storage.exists(uploaded[0].image.name))
+        self.assertEqual(ImageBlob.objects.get(name=uploaded[0].image.name).ref_count, 1)
+
+
+@override_settings(POST_LIST_CACHE_ENABLED=False, IMAGE_VARIANTS_ENABLED=False)
+class PostListQueryCountTests(PostTestCase):
+    def add_posts(self, count):
+        for i in range(count):
+            post = self.create_post(title=f"Post {i}")
+            images = [self.create_image(post, f"{i}-{j}.png", color) for j, color in enumerate(("red", "blue"))]
+            generate_variants(images[0])
+            post.thumbnail = images[0]
+            post.save(update_fields=["thumbnail", "updated_at"])
+            add_like(post.id, self.reader.id)
+
+    def get_page(self, url, fast, user, **params):
+        self.client.force_authenticate(user)
+        with override_settings(POST_FAST_RENDERING=fast), CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, {"page_size": 20, **params})
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(all(post["thumbnail_variants"] for post in response.data["results"]))
+        return len(queries), len(response.data["results"])
+
+    def test_queries_do_not_grow_with_the_page(self):
+        cases = [
+            (url, fast, user, params)
+            for url, fast in (("/posts/", True), ("/posts/", False), ("/async/posts/", False))
+            for user in (None, self.reader)
+            for params in ({}, {"pagination": "cursor"})
+        ]
+        self.add_posts(1)
+        single = [self.get_page(*case[:3], **case[3]) for case in cases]
+        self.add_posts(9)
+
+        for case, (queries, results) in zip(cases, single):
+            with self.subTest(url=case[0], fast=case[1], user=case[2], params=case[3]):
+                self.assertEqual(results, 1)
+                self.assertEqual(self.get_page(*case[:3], **case[3]), (queries, 10))
+
+
+class PostCursorPaginationTests(PostTestCase):
+    def walk(self, url, on_page=None):
+        seen = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            self.assertNotIn("count", response.data)
+            seen += [post["id"] for post in response.data["results"]]
+            if on_page:
+                on_page()
+            url = response.data["next"]
+        return seen, response
+
+    def test_next_and_previous_links(self):
+        posts = [self.create_post(title=f"Post {i}") for i in range(5)]
+        expected = [post.id for post in reversed(posts)]
+
+        first = self.client.get("/posts/", {"pagination": "cursor", "page_size": 2})
+        self.assertIsNone(first.data["previous"])
+        seen, last = self.walk(first.data["next"])
+        self.assertEqual([post["id"] for post in first.data["results"]] + seen, expected)
+        self.assertIsNone(last.data["next"])
+
+        previous = self.client.get(last.data["previous"])
+        self.assertEqual([post["id"] for post in previous.data["results"]], expected[2:4])
+        previous = self.client.get(previous.data["previous"])
+        self.assertEqual([post["id"] for post in previous.data["results"]], expected[:2])
+        self.assertIsNone(previous.data["previous"])
+
+    def test_inserts_between_pages_cause_no_duplicates_or_gaps(self):
+        posts = [self.create_post(title=f"Post {i}") for i in range(7)]
+        expected = [post.id for post in reversed(posts)]
+
+        seen, _ = self.walk("/posts/?pagination=cursor&page_size=2", lambda: self.create_post(title="New"))
+
+        self.assertEqual(seen, expected)
+
+    def test_tampered_cursor_is_not_found(self):
+        self.create_post()
+        positions = ["garbage", '["2024-01-01T00:00:00+00:00"]', '["not a date", 1]', '{"id": 1}']
+        for position in positions:
+            with self.subTest(position=position):
+                cursor = base64.b64encode(urlencode({"p": position}).encode()).decode()
+                self.assertEqual(self.client.get("/posts/", {"cursor": cursor}).status_code, 404)
+
+    def test_page_size_is_capped(self):
+        self.seed_posts(60)
+        response = self.client.get("/posts/", {"pagination": "cursor", "page_size": 500})
+        self.assertEqual(len(response.data["results"]), PostCursorPagination.max_page_size)
+        self.assertIsNotNone(response.data["next"])
+
+    def test_deep_page_seeks_through_index(self):
+        self.seed_posts(2000)
+        posts = Post.objects.with_pending_likes().values(*POST_LIST_FIELDS)
+        page = posts.filter(self.deep_seek(posts, POST_ORDERING)).order_by(*POST_ORDERING)[:11]
+        plan = self.explain(page, analyze=True)
+        self.assertIn("post_created_at_id_idx", plan)
+        self.assert_index_seek(plan, "created_at")
+
+
+class PostListFilterTests(PostTestCase):
+    def list_queryset(self, params, cursor=False):
+        query = PostListQuerySerializer(data=params)
+        query.is_valid(raise_exception=True)
+        ordering = query.get_ordering()
+        posts = Post.objects.with_pending_likes().values(*POST_LIST_FIELDS).filter(**query.get_filters())
+        if cursor:
+            posts = posts.filter(self.deep_seek(posts, ordering))
+        return posts.order_by(*ordering)[:11], ordering
+
+    def test_filters_and_ordering(self):
+        other = get_user_model().objects.create_user(username="other", email="other@example.com", password="pass12345")
+        posts = [self.create_post(title=f"Post {i}") for i in range(6)]
+        for i, post in enumerate(posts):
+            Post.objects.filter(id=post.id).update(likes_count=i % 3)
+        other_post = self.create_post(author=other)
+
+        response = self.client.get("/posts/", {"author": other.id})
+        self.assertEqual([post["id"] for post in response.data["results"]], [other_post.id])
+
+        expected = list(Post.objects.order_by("-likes_count", "-id").values_list("id", flat=True))
+        response = self.client.get("/posts/", {"ordering": "-likes_count"})
+        self.assertEqual([post["id"] for post in response.data["results"]], expected)
+
+        seen, url = [], "/posts/?ordering=-likes_count&pagination=cursor&page_size=2"
+        while url:
+            response = self.client.get(url)
+            seen += [post["id"] for post in response.data["results"]]
+            url = response.data["next"]
+        self.assertEqual(seen, expected)
+
+        tomorrow = timezone.now() + datetime.timedelta(days=1)
+        self.assertEqual(self.client.get("/posts/", {"created_after": tomorrow.isoformat()}).data["count"], 0)
+        self.assertEqual(self.client.get("/posts/", {"created_before": tomorrow.isoformat()}).data["count"], 7)
+
+    def test_invalid_filters_are_rejected(self):
+        self.assertEqual(self.client.get("/posts/", {"ordering": "title"}).status_code, 400)
+        self.assertEqual(self.client.get("/posts/", {"author": "abc"}).status_code, 400)
+
+    def test_query_plans_use_matching_index(self):
+        authors = self.seed_posts(2000)
+        since = (timezone.now() - datetime.timedelta(days=7)).isoformat()
+        cases = [
+            ({}, "post_created_at_id_idx"),
+            ({"ordering": "-likes_count"}, "post_likes_count_id_idx"),
+            ({"author": authors[0].id}, "post_author_created_at_id_idx"),
+            ({"author": authors[0].id, "ordering": "-likes_count"}, "post_author_likes_count_id_idx"),
+            ({"created_after": since}, "post_created_at_id_idx"),
+            ({"created_after": since, "created_before": timezone.now().isoformat()}, "post_created_at_id_idx"),
+            ({"author": authors[0].id, "created_after": since}, "post_author_created_at_id_idx"),
+        ]
+        for params, index in cases:
+            for cursor in (False, True):
+                with self.subTest(params=params, cursor=cursor):
+                    queryset, ordering = self.list_queryset(params, cursor)
+                    plan = self.explain(queryset, analyze=True)
+                    self.assertIn(index, plan)
+                    self.assertNotIn("Sort", plan)
+                    if cursor:
+                        self.assert_index_seek(plan, ordering[0].lstrip("-"))
+
+
+class PostSearchTests(PostTestCase):
+    def search(self, text):
+        return Post.objects.filter(search_vector=SearchQuery(text, config=POST_SEARCH_CONFIG, search_type="websearch"))
+
+    def test_search_vector_follows_insert_and_update(self):
+        post = self.create_post(title="Погода", text="Сегодня видел котиков во дворе")
+        self.assertEqual(list(self.search("котик").values_list("id", flat=True)), [post.id])
+
+        post.text = "Сегодня шёл дождь"
+        post.save()
+        self.assertFalse(self.search("котик").exists())
+        self.assertTrue(self.search("дождь").exists())
+
+        Post.objects.filter(id=post.id).update(title="Котики")
+        self.assertTrue(self.search("котик").exists())
+
+    def test_title_matches_rank_above_text_matches(self):
+        in_text = self.create_post(title="Погода", text="Сегодня видел котиков во дворе")
+        in_title = self.create_post(title="Котики и собаки", text="Про животных")
+        self.create_post(title="Python tips", text="Running things")
+
+        response = self.client.get("/posts/search/", {"q": "котик"})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([post["id"] for post in response.data["results"]], [in_title.id, in_text.id])
+
+    def test_missing_query_is_rejected(self):
+        for params in ({}, {"q": "   "}):
+            response = self.client.get("/posts/search/", params)
+            self.assertEqual(response.status_code, 400)
+            self.assertEqual(response.data["message"], "Query parameter 'q' is required")
+
+    def test_search_uses_gin_index(self):
+        self.create_post(title="Котики", text="Про животных")
+        self.seed_posts(2000)
+        with connection.cursor() as cursor:
+            # Rolled-back rows from earlier tests sit in the GIN pending list and inflate its cost
+            cursor.execute("SELECT gin_clean_pending_list('post_search_vector_idx'::regclass)")
+        query = SearchQuery("котик", config=POST_SEARCH_CONFIG, search_type="websearch")
+        posts = (
+            Post.objects.for_list()
+            .filter(search_vector=query)
+            .annotate(rank=SearchRank(F("search_vector"), query))
+        )
+        self.assertIn("post_search_vector_idx", self.explain(posts))
+
+
+class PostTrendingTests(PostTestCase):
+    def test_cursor_walk_follows_score(self):
+        posts = [self.create_post(title=f"Post {i}") for i in range(5)]
+        for post, score in zip(posts, [3.0, 5.0, 1.0, 5.0, 2.0]):
+            PostTrendingScore.objects.filter(post=post).update(score=score)
+        expected = [posts[3].id, posts[1].id, posts[0].id, posts[4].id, posts[2].id]
+
+        seen, url = [], "/posts/trending/?page_size=2"
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            self.assertNotIn("count", response.data)
+            seen += [post["id"] for post in response.data["results"]]
+            url = response.data["next"]
+        self.assertEqual(seen, expected)
+
+        response = self.client.get(response.data["previous"])
+        self.assertEqual([post["id"] for post in response.data["results"]], expected[2:4])
+
+    def test_invalid_cursor_is_not_found(self):
+        self.assertEqual(self.client.get("/posts/trending/", {"cursor": "garbage"}).status_code, 404)
+
+    def test_page_does_not_count(self):
+        self.create_post()
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get("/posts/trending/")
+        self.assertFalse(any("COUNT(" in query["sql"] for query in queries.captured_queries))
+
+    def test_keyset_uses_score_index(self):
+        self.seed_posts(2000)
+        PostTrendingScore.objects.bulk_create(
+            PostTrendingScore(post=post, score=post.likes_count, updated_at=post.created_at)
+            for post in Post.objects.all()
+        )
+        with connection.cursor() as cursor:
+            cursor.execute(f"ANALYZE {PostTrendingScore._meta.db_table}")
+        scores = PostTrendingScore.objects.values("post_id", "score")
+        for queryset in (scores, scores.filter(self.deep_seek(scores, TRENDING_ORDERING))):
+            plan = self.explain(queryset.order_by(*TRENDING_ORDERING)[:11], analyze=True)
+            self.assertIn("post_trending_score_idx", plan)
+            self.assertNotIn("Sort", plan)
+        self.assert_index_seek(plan, "score")
+
+
+@override_settings(IMAGE_VARIANTS_ENABLED=False)
+class PostRenderingParityTests(PostTestCase):
+    def setUp(self):
+        super().setUp()
+        self.plain = self.create_post(title="Без картинок", text="Текст")
+        self.post = self.create_post(title='Ёж "в тумане"', text="ü" * 300 + "\u2028")
+        for name in ("first.png", "second image.png"):
+            generate_variants(self.create_image(self.post, name))
+        self.post.thumbnail = self.post.images.order_by("id").first()
+        self.post.save(update_fields=["thumbnail"])
+        add_like(self.post.id, self.reader.id)
+        add_like(self.plain.id, self.user.id)
+
+    def render_list(self, liked_post_ids):
+        rows = list(Post.objects.with_pending_likes().values(*POST_LIST_FIELDS).order_by(*POST_ORDERING))
+        fast = render_post_list(attach_thumbnail_variants(rows), liked_post_ids)
+        posts = Post.objects.for_list().order_by(*POST_ORDERING)
+        slow = PostListResponseSerializer(posts, many=True, context={"liked_post_ids": liked_post_ids}).data
+        return FastJSONRenderer().render(fast), JSONRenderer().render(slow)
+
+    def render_detail(self, post_id, liked_post_ids):
+        fast = render_post_detail(post_id, liked_post_ids)
+        post = (
+            Post.objects.with_pending_likes()
+            .select_related("author")
+            .prefetch_related("images__variants")
+            .get(id=post_id)
+        )
+        slow = PostDetailResponseSerializer(post, context={"liked_post_ids": liked_post_ids}).data
+        return FastJSONRenderer().render(fast), JSONRenderer().render(slow)
+
+    def assert_parity(self):
+        for liked_post_ids in (None, set(), {self.post.id}):
+            with self.subTest(liked_post_ids=liked_post_ids):
+                self.assertEqual(*self.render_list(liked_post_ids))
+                for post_id in (self.post.id, self.plain.id):
+                    self.assertEqual(*self.render_detail(post_id, liked_post_ids))
+
+    def test_matches_serializers(self):
+        fast, _ = self.render_detail(self.post.id, None)
+        self.assertEqual(fast.count(b'"format"'), 2 * 2 * 2)
+        self.assert_parity()
+
+    def test_matches_serializers_across_timezones(self):
+        for zone in ("Asia/Tomsk", "America/St_Johns", "UTC"):
+            with self.subTest(zone=zone), timezone.override(zone):
+                self.assert_parity()
+
+    @override_settings(POST_LIKES_WRITE_BEHIND=True)
+    def test_matches_serializers_with_pending_likes(self):
+        add_like(self.post.id, self.user.id)
+        self.assertTrue(PostLikeDelta.objects.exists())
+        self.assert_parity()
+
+    def test_endpoints_match_serializer_path(self):
+        self.client.force_authenticate(self.reader)
+        for url in ("/posts/", "/posts/?pagination=cursor&page_size=1", f"/posts/{self.post.id}/"):
+            with override_settings(POST_FAST_RENDERING=False, POST_LIST_CACHE_ENABLED=False):
+                slow = self.client.get(url)
+            with override_settings(POST_FAST_RENDERING=True, POST_LIST_CACHE_ENABLED=False):
+                fast = self.client.get(url)
+            self.assertEqual(fast.content, slow.content)
+            self.assertEqual(fast["ETag"], slow["ETag"])
+
+
+class PostLikeMetricsTests(PostTestCase):
+    def likes_total(self, action):
+        return REGISTRY.get_sample_value("post_likes_total", {"action": action}) or 0
+
+    def like_and_unlike(self, post):
+        self.client.force_authenticate(self.reader)
+        self.assertEqual(self.client.post(f"/posts/{post.id}/like/").status_code, 200)
+        self.assertEqual(self.client.delete(f"/posts/{post.id}/unlike/").status_code, 200)
+
+    @override_settings(METRICS_ENABLED=False)
+    def test_not_recorded_when_disabled(self):
+        before = self.likes_total("like"), self.likes_total("unlike")
+        self.like_and_unlike(self.create_post())
+        self.assertEqual((self.likes_total("like"), self.likes_total("unlike")), before)
+
+    @override_settings(METRICS_ENABLED=True, METRICS_TOKEN="scrape")
+    def test_recorded_when_enabled(self):
+        before = self.likes_total("like"), self.likes_total("unlike")
+        self.like_and_unlike(self.create_post())
+        self.assertEqual((self.likes_total("like"), self.likes_total("unlike")), (before[0] + 1, before[1] + 1))
+
+        self.client.force_authenticate(None)
+        body = self.client.get("/metrics", HTTP_AUTHORIZATION="Bearer scrape").content.decode()
+        self.assertIn('post_likes_total{action="like"}', body)
+
+
+@override_settings(METRICS_ENABLED=True, METRICS_TOKEN="scrape")
+class MetricsEndpointTests(PostTestCase):
+    def test_requires_the_token(self):
+        self.assertEqual(self.client.get("/metrics").status_code, 401)
+        self.assertEqual(self.client.get("/metrics", HTTP_AUTHORIZATION="Bearer wrong").status_code, 401)
+        self.assertEqual(self.client.get("/metrics", HTTP_AUTHORIZATION="Bearer scrape").status_code, 200)
+
+    def test_staff_login_is_not_enough(self):
+        self.user.is_staff = True
+        self.user.save()
+        self.client.force_authenticate(self.user)
+        self.assertEqual(self.client.get("/metrics").status_code, 401)
+
+    @override_settings(METRICS_TOKEN="")
+    def test_enabled_without_token_refuses_to_start(self):
+        with self.assertRaises(ImproperlyConfigured):
+            self.client.get("/metrics")
+
+    @override_settings(METRICS_TOKEN="")
+    def test_view_without_token_is_not_served(self):
+        request = RequestFactory().get("/metrics")
+        with self.assertRaises(Http404):
+            metrics_view(request)
+
+    @override_settings(SECURE_SSL_REDIRECT=True)
+    def test_plain_http_is_redirected(self):
+        response = self.client.get("/metrics", HTTP_AUTHORIZATION="Bearer scrape")
+        self.assertEqual(response.status_code, 301)
+        self.assertTrue(response["Location"].startswith("https://"))
+
+
+@override_settings(DATABASE_REPLICAS=["replica_0"], CACHES=PIN_CACHES, REPLICA_PIN_CACHE_ALIAS="replica-pins")
+class ReplicaRoutingTests(PostTestCase):
+    def setUp(self):
+        super().setUp()
+        self.addCleanup(caches["replica-pins"].clear)
+
+    def route(self, method="get", user=None, status=200):
+        headers = {"HTTP_AUTHORIZATION": f"Bearer {AccessToken.for_user(user)}"} if user else {}
+        request = getattr(RequestFactory(), method)("/posts/", **headers)
+        routes = {}
+
+        def get_response(request):
+            routes["post"] = router.db_for_read(Post)
+            routes["user"] = router.db_for_read(get_user_model())
+            if user is not None:
+                request.user = user
+            return HttpResponse(status=status)
+
+        ReplicaRoutingMiddleware(get_response)(request)
+        return routes
+
+    def test_safe_requests_read_from_replica(self):
+        self.assertEqual(self.route(), {"post": "replica_0", "user": "default"})
+        self.assertEqual(self.route(user=self.user), {"post": "replica_0", "user": "default"})
+
+    def test_writer_is_pinned_to_primary(self):
+        self.assertEqual(self.route("post", user=self.user)["post"], "default")
+        self.assertEqual(self.route(user=self.user)["post"], "default")
+        self.assertEqual(self.route(user=self.reader)["post"], "replica_0")
+        self.assertEqual(self.route()["post"], "replica_0")
+
+    def test_failed_write_does_not_pin(self):
+        self.route("post", user=self.user, status=400)
+        self.assertEqual(self.route(user=self.user)["post"], "replica_0")
+
+    def test_reads_outside_requests_use_primary(self):
+        self.assertEqual(router.db_for_read(Post), "default")
+        self.assertEqual(router.db_for_write(Post), "default")
+        self.assertFalse(router.allow_migrate("replica_0", "post_app"))
+
+    def test_process_local_pin_cache_is_rejected(self):
+        for backend in ("locmem.LocMemCache", "dummy.DummyCache"):
+            local = {**PIN_CACHES, "replica-pins": {"BACKEND": f"django.core.cache.backends.{backend}"}}
+            with self.subTest(backend=backend), override_settings(CACHES=local):
+                with self.assertRaises(ImproperlyConfigured):
+                    ReplicaRoutingMiddleware(lambda request: HttpResponse())
+
+
+@skipUnless(settings.DATABASE_REPLICAS, "DB_REPLICA_URLS is not set")
+@override_settings(SECURE_SSL_REDIRECT=False, CACHES=PIN_CACHES, REPLICA_PIN_CACHE_ALIAS="replica-pins")
+class ReplicaRoutingDatabaseTests(TransactionTestCase):
+    databases = {"default", *settings.DATABASE_REPLICAS}
+
+    def setUp(self):
+        # The cache outlives each test's rollback, and bumps wait for a commit that never comes here
+        post_list_cache.cache.clear()
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            username="author", email="author@example.com", password="pass12345"
+        )
+        self.post = Post.objects.create(author=self.user, title="Title", text="Text")
+        self.authorization = f"Bearer {AccessToken.for_user(self.user)}"
+
+    def count_queries(self, call):
+        replica = settings.DATABASE_REPLICAS[0]
+        with CaptureQueriesContext(connections["default"]) as primary, \
+                CaptureQueriesContext(connections[replica]) as replicas:
+            response = call()
+        return response, len(primary), len(replicas)
+
+    def test_reads_follow_writes(self):
+        _, primary, replica = self.count_queries(lambda: self.client.get("/posts/"))
+        self.assertEqual(primary, 0)
+        self.assertGreater(replica, 0)
+
+        response, _, replica = self.count_queries(
+            lambda: self.client.post(f"/posts/{self.post.id}/like/", HTTP_AUTHORIZATION=self.authorization)
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(replica, 0)
+
+        response, _, replica = self.count_queries(
+            lambda: self.client.get(f"/posts/{self.post.id}/", HTTP_AUTHORIZATION=self.authorization)
+        )
+        self.assertEqual(replica, 0)
+        self.assertTrue(response.data["liked_by_me"])
+
+        _, primary, _ = self.count_queries(lambda: self.client.get(f"/posts/{self.post.id}/"))
+        self.assertEqual(primary, 0)
+
+
+@override_settings(POST_SYNC_SAFETY_LAG_SECONDS=0, IMAGE_VARIANTS_ENABLED=False)
+class PostChangesTests(PostTestCase):
+    def drain(self, since=None):
+        posts, deleted = [], []
+        while True:
+            params = {"limit": 2, **({"since": since} if since else {})}
+            response = self.client.get("/posts/changes/", params)
+            self.assertEqual(response.status_code, 200)
+            posts += response.data["posts"]
+            deleted += response.data["deleted"]
+            since = response.data["next"]
+            if not response.data["has_more"]:
+                return posts, deleted, since
+
+    def test_edits_and_deletes_are_synced(self):
+        posts = [self.create_post(title=f"Post {i}") for i in range(5)]
+        synced, deleted, token = self.drain()
+        self.assertEqual([post["id"] for post in synced], [post.id for post in posts])
+        self.assertEqual(deleted, [])
+
+        posts[1].title = "Edited"
+        posts[1].save()
+        deleted_id = posts[3].id
+        posts[3].delete()
+
+        synced, deleted, token = self.drain(token)
+        self.assertEqual([(post["id"], post["title"]) for post in synced], [(posts[1].id, "Edited")])
+        self.assertEqual(deleted, [deleted_id])
+        self.assertEqual(self.drain(token)[:2], ([], []))
+
+    def test_thumbnail_reassignment_is_synced(self):
+        post = self.create_post()
+        first, second = self.create_image(post, "first.png"), self.create_image(post, "second.png")
+        post.thumbnail = first
+        post.save(update_fields=["thumbnail", "updated_at"])
+        _, _, token = self.drain()
+
+        first.delete()
+
+        synced, _, _ = self.drain(token)
+        self.assertEqual([(item["id"], item["thumbnail"]) for item in synced], [(post.id, second.image.url)])
+
+    def test_variant_generation_is_synced(self):
+        post = self.create_post()
+        post.thumbnail = self.create_image(post)
+        post.save(update_fields=["thumbnail", "updated_at"])
+        synced, _, token = self.drain()
+        self.assertEqual(synced[0]["thumbnail_variants"], [])
+
+        generate_variants(post.thumbnail)
+
+        synced, _, _ = self.drain(token)
+        self.assertEqual([item["id"] for item in synced], [post.id])
+        self.assertEqual(len(synced[0]["thumbnail_variants"]), 4)
+
+    def test_likes_are_not_synced(self):
+        post = self.create_post()
+        _, _, token = self.drain()
+        add_like(post.id, self.reader.id)
+        self.assertEqual(self.drain(token)[:2], ([], []))
+
+
+class PostExportTests(PostTestCase):
+    def setUp(self):
+        super().setUp()
+        self.staff = get_user_model().objects.create_user(
+            username="staff", email="staff@example.com", password="pass12345", is_staff=True
+        )
+
+    def export(self, **params):
+        self.client.force_authenticate(self.staff)
+        response = self.client.get("/posts/export/", params)
+        self.assertEqual(response.status_code, 200)
+        return [json.loads(line) for line in b"".join(response.streaming_content).decode().splitlines()]
+
+    def test_anonymous_is_rejected(self):
+        self.create_post()
+        self.assertEqual(self.client.get("/posts/export/").status_code, 401)
+
+    def test_non_staff_is_rejected_even_for_own_posts(self):
+        self.create_post()
+        for user in (self.user, self.reader):
+            self.client.force_authenticate(user)
+            self.assertEqual(self.client.get("/posts/export/").status_code, 403)
+
+    def test_streams_one_post_per_line(self):
+        posts = [self.create_post(title=f"Post {i}") for i in range(3)]
+        image = self.create_image(posts[0])
+        self.client.force_authenticate(self.staff)
+
+        with override_settings(POST_EXPORT_CHUNK_SIZE=2):
+            response = self.client.get("/posts/export/")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        self.assertEqual(response["Content-Type"], "application/x-ndjson")
+        self.assertEqual(response["Content-Disposition"], 'attachment; filename="posts.ndjson"')
+        chunks = list(response.streaming_content)
+        self.assertEqual(len(chunks), 2)
+        lines = b"".join(chunks).decode().split("\n")
+        self.assertEqual(lines[-1], "")
+        exported = [json.loads(line) for line in lines[:-1]]
+        self.assertEqual([item["id"] for item in exported], [post.id for post in posts])
+        self.assertEqual(exported[0]["author_username"], "author")
+        self.assertEqual(exported[0]["images"], [{"id": image.id, "url": image.image.url}])
+        self.assertEqual(exported[1]["images"], [])
+
+    def test_since_exports_only_later_changes(self):
+        old, recent = self.create_post(title="Old"), self.create_post(title="Recent")
+        since = timezone.now() - datetime.timedelta(hours=1)
+        Post.objects.filter(id=old.id).update(updated_at=since - datetime.timedelta(hours=1))
+
+        self.assertEqual([item["id"] for item in self.export(since=since.isoformat())], [recent.id])
+        self.assertEqual([item["id"] for item in self.export()], [old.id, recent.id])
+
+    def test_invalid_since_is_rejected(self):
+        self.client.force_authenticate(self.staff)
+        self.assertEqual(self.client.get("/posts/export/", {"since": "yesterday"}).status_code, 400)
+
+
+class PostUpdateTests(PostTestCase):
+    def test_update_keeps_like_landing_after_load(self):
+        post = self.create_post()
+        stale = Post.objects.get(id=post.id)
+        add_like(post.id, self.reader.id)
+
+        CreatePostRequestSerializer().update(stale, {"title": "New title", "text": "New text"})
+
+        post.refresh_from_db()
+        self.assertEqual(post.likes_count, 1)
+        self.assertEqual(post.title, "New title")
+        self.assertEqual(post.preview_text, "New text")
+        self.assertGreater(post.updated_at, stale.created_at)
+
+    @override_settings(POST_LIKES_WRITE_BEHIND=True)
+    def test_update_keeps_flushed_like_deltas(self):
+        post = self.create_post()
+        stale = Post.objects.get(id=post.id)
+        add_like(post.id, self.reader.id)
+        add_like(post.id, self.user.id)
+        flush_like_deltas(batch_size=100)
+
+        CreatePostRequestSerializer().update(stale, {"title": "New title", "text": "New text"})
+
+        post.refresh_from_db()
+        self.assertEqual(post.likes_count, 2)
+
+
+class PostPreviewTextTests(PostTestCase):
+    def test_preview_is_cut_at_the_preview_length(self):
+        exact = self.create_post(text="а" * POST_PREVIEW_LENGTH)
+        long = self.create_post(text="б" * (POST_PREVIEW_LENGTH + 50))
+
+        self.assertEqual(exact.preview_text, exact.text)
+        self.assertEqual(long.preview_text, "б" * POST_PREVIEW_LENGTH + "...")
+        response = self.client.get("/posts/")
+        self.assertEqual([post["preview_text"] for post in response.data["results"]], [long.preview_text, exact.text])
+
+    def test_saving_text_refreshes_preview(self):
+        post = self.create_post(text="Short")
+        post.text = "в" * (POST_PREVIEW_LENGTH + 1)
+        post.save(update_fields=["text"])
+
+        post.refresh_from_db()
+        self.assertEqual(post.preview_text, make_preview_text(post.text))
+
+    def test_migration_backfills_empty_previews(self):
+        texts = ["Short", "г" * POST_PREVIEW_LENGTH, "д" * (POST_PREVIEW_LENGTH + 1), ""]
+        posts = [self.create_post(text=text) for text in texts]
+        Post.objects.update(preview_text="")
+        migration = importlib.import_module("apps.post_app.migrations.0016_backfill_post_preview_text")
+
+        with mock.patch.object(migration, "BATCH_SIZE", 2):
+            migration.fill_preview_text(django_apps, None)
+
+        previews = dict(Post.objects.values_list("id", "preview_text"))
+        self.assertEqual([previews[post.id] for post in posts], [make_preview_text(text) for text in texts])
+
+
+@override_settings(POST_LIKES_WRITE_BEHIND=True)
+class PostLikeFlushTests(PostTestCase):
+    def likers(self, count):
+        return get_user_model().objects.bulk_create(
+            get_user_model()(username=f"liker{i}", email=f"liker{i}@example.com") for i in range(count)
+        )
+
+    def test_deltas_are_applied_exactly_once(self):
+        post, other = self.create_post(), self.create_post()
+        users = self.likers(4)
+        for user in users:
+            add_like(post.id, user.id)
+        add_like(other.id, users[0].id)
+        remove_like(post.id, users[1].id)
+        self.assertEqual(Post.objects.with_pending_likes().get(id=post.id).total_likes_count, 3)
+
+        flushed = []
+        while True:
+            count, _ = flush_like_deltas(batch_size=2)
+            if not count:
+                break
+            flushed.append(count)
+
+        self.assertEqual(flushed, [2, 2, 2])
+        self.assertEqual(PostLikeDelta.objects.count(), 0)
+        self.assertEqual(flush_like_deltas(batch_size=2), (0, []))
+        counts = dict(Post.objects.values_list("id", "likes_count"))
+        self.assertEqual((counts[post.id], counts[other.id]), (3, 1))
+
+    def test_count_never_goes_negative(self):
+        post = self.create_post()
+        self.assertFalse(remove_like(post.id, self.reader.id))
+        for _ in range(2):
+            add_like(post.id, self.reader.id)
+            remove_like(post.id, self.reader.id)
+
+        counts = []
+        while flush_like_deltas(batch_size=1)[0]:
+            counts.append(Post.objects.get(id=post.id).likes_count)
+
+        self.assertEqual(counts, [1, 0, 1, 0])
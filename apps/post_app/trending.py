@@ -0,0 +1,34 @@
+from django.conf import settings
+from django.db import connection
+
+from apps.post_app.models import Post, PostTrendingScore
+
+# Hot ranking: (likes + 1) / (age_in_hours + 2) ^ gravity
+REFRESH_SQL = """
+    INSERT INTO {scores} (post_id, score, updated_at)
+    SELECT id, (likes_count + 1) / power(EXTRACT(EPOCH FROM now() - created_at) / 3600 + 2, %s), now()
+    FROM {posts}
+    WHERE id = ANY(%s) AND created_at >= now() - make_interval(days => %s)
+    ON CONFLICT (post_id) DO UPDATE SET score = EXCLUDED.score, updated_at = EXCLUDED.updated_at
+"""
+
+PRUNE_SQL = """
+    DELETE FROM {scores} USING {posts}
+    WHERE {scores}.post_id = {posts}.id AND {posts}.created_at < now() - make_interval(days => %s)
+"""
+
+
+def _execute(sql, params):
+    with connection.cursor() as cursor:
+        cursor.execute(sql.format(scores=PostTrendingScore._meta.db_table, posts=Post._meta.db_table), params)
+        return cursor.rowcount
+
+
+def refresh_trending_scores(post_ids):
+    if not post_ids:
+        return 0
+    return _execute(REFRESH_SQL, [settings.TRENDING_GRAVITY, list(post_ids), settings.TRENDING_WINDOW_DAYS])
+
+
+def prune_trending_scores():
+    return _execute(PRUNE_SQL, [settings.TRENDING_WINDOW_DAYS])
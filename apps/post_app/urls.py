@@ -1,8 +1,13 @@
 ﻿from django.urls import path
-from .views import PostListCreateView, PostUpdateDetailView, PostLikeView, PostUnlikeView
+from .views import PostListCreateView, PostChangesView, PostExportView, PostSearchView, PostTrendingView, \
+    PostUpdateDetailView, PostLikeView, PostUnlikeView
 
 urlpatterns = [
     path("", PostListCreateView.as_view(), name="post-list-create"),
+    path("search/", PostSearchView.as_view(), name="post-search"),
+    path("trending/", PostTrendingView.as_view(), name="post-trending"),
+    path("changes/", PostChangesView.as_view(), name="post-changes"),
+    path("export/", PostExportView.as_view(), name="post-export"),
     path("<int:post_id>/", PostUpdateDetailView.as_view(), name="post-detail-update"),
     path("<int:post_id>/like/", PostLikeView.as_view(), name="post-like"),
     path("<int:post_id>/unlike/", PostUnlikeView.as_view(), name="post-unlike"),
@@ -0,0 +1,7 @@
+from django.urls import path
+from .views_async import AsyncPostListView, AsyncPostDetailView
+
+urlpatterns = [
+    path("", AsyncPostListView.as_view(), name="post-list-async"),
+    path("<int:post_id>/", AsyncPostDetailView.as_view(), name="post-detail-async"),
+]
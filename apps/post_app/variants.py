@@ -0,0 +1,95 @@
+import io
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import IntegrityError, connections, transaction
+from django.utils import timezone
+from PIL import Image, ImageOps
+
+from apps.post_app.blobs import release_image
+from apps.post_app.cache import post_list_cache
+from apps.post_app.models import Post, PostImage, PostImageVariant
+
+logger = logging.getLogger(__name__)
+
+VARIANT_FORMATS = {
+    "webp": {"format": "WEBP", "quality": 80, "method": 4},
+    "jpeg": {"format": "JPEG", "quality": 82, "optimize": True, "progressive": True},
+}
+
+_executor = None
+_slots = None
+_executor_lock = threading.Lock()
+
+
+def generate_variants(post_image):
+    existing = set(post_image.variants.values_list("width", "format"))
+    with post_image.image.open("rb") as image_file:
+        source = ImageOps.exif_transpose(Image.open(image_file))
+        source.load()
+
+    stem = os.path.splitext(os.path.basename(post_image.image.name))[0]
+    created = 0
+    for width in settings.IMAGE_VARIANT_WIDTHS:
+        if width >= source.width:
+            continue
+        resized = source.copy()
+        resized.thumbnail((width, source.height), Image.Resampling.LANCZOS)
+        for variant_format, save_options in VARIANT_FORMATS.items():
+            if (width, variant_format) in existing:
+                continue
+            image = resized if variant_format == "webp" else resized.convert("RGB")
+            buffer = io.BytesIO()
+            image.save(buffer, **save_options)
+            created += _save_variant(post_image, width, variant_format, buffer.getvalue(), stem)
+    if created:
+        # New variants change the post's payload, so delta sync and export have to pick it up again
+        Post.objects.filter(id=post_image.post_id).update(updated_at=timezone.now())
+    return created
+
+
+def _save_variant(post_image, width, variant_format, content, stem):
+    variant = PostImageVariant(image=post_image, width=width, format=variant_format)
+    variant.file.save(f"{stem}_{width}.{variant_format}", ContentFile(content), save=False)
+    try:
+        with transaction.atomic():
+            variant.save()
+    except IntegrityError:
+        # Another worker produced the same variant first
+        release_image(variant.file.name, variant.file.storage)
+        return 0
+    return 1
+
+
+def _get_executor():
+    global _executor, _slots
+    with _executor_lock:
+        if _executor is None:
+            workers = settings.IMAGE_VARIANT_WORKERS
+            _executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="image-variants")
+            _slots = threading.BoundedSemaphore(workers + settings.IMAGE_VARIANT_QUEUE_SIZE)
+    return _executor, _slots
+
+
+def schedule_variants(post_image_id):
+    executor, slots = _get_executor()
+    if not slots.acquire(blocking=False):
+        logger.warning("Image variant queue is full, skipping post image %s", post_image_id)
+        return
+    future = executor.submit(_process, post_image_id)
+    future.add_done_callback(lambda _: slots.release())
+
+
+def _process(post_image_id):
+    try:
+        post_image = PostImage.objects.filter(id=post_image_id).first()
+        if post_image is not None and generate_variants(post_image):
+            post_list_cache.bump()
+    except Exception:
+        logger.exception("Failed to generate variants for post image %s", post_image_id)
+    finally:
+        connections.close_all()
@@ -1,17 +1,33 @@
+from django.conf import settings
+from django.contrib.postgres.search import SearchQuery, SearchRank
+from django.db import router
+from django.db.models import F
+from django.http import StreamingHttpResponse
 from drf_yasg import openapi
 from drf_yasg.utils import swagger_auto_schema
 from rest_framework import status, parsers
 from rest_framework.exceptions import NotFound
-from rest_framework.permissions import IsAuthenticated, AllowAny
+from rest_framework.permissions import IsAdminUser, IsAuthenticated, AllowAny
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
+from core.conditional import conditional_response, set_validators
+from core.metrics import record_like
 from core.mixins import ErrorResponseMixin
 from core.serializers import ErrorResponseSerializer
-from .models import Post
-from .pagination import PostPagination
-from .serializers import CreatePostRequestSerializer
-from .serializers_response import PostListResponseSerializer, PostDetailResponseSerializer, PaginatedPostListSerializer
+from core.timing import timed
+from .cache import post_list_cache
+from .etags import get_post_detail_etag, get_post_list_etag
+from .export import iter_post_export
+from .likes import add_like, remove_like, get_liked_post_ids
+from .models import Post, PostTrendingScore, POST_SEARCH_CONFIG
+from .pagination import POST_ORDERING, TRENDING_ORDERING, PostCursorPagination, PostPagination, get_post_paginator
+from .rendering import POST_LIST_FIELDS, attach_thumbnail_variants, render_post_list, render_post_detail
+from .serializers import CreatePostRequestSerializer, PostChangesQuerySerializer, PostExportQuerySerializer, \
+    PostListQuerySerializer
+from .serializers_response import PostListResponseSerializer, PostDetailResponseSerializer, \
+    PaginatedPostListSerializer, CursorPaginatedPostListSerializer, PostChangesResponseSerializer
+from .sync import get_post_changes
 
 title_param = openapi.Parameter(
     name="title",
@@ -45,6 +61,28 @@ delete_images_param = openapi.Parameter(
     required=False,
     collectionFormat="multi"
 )
+pagination_param = openapi.Parameter(
+    name="pagination",
+    in_=openapi.IN_QUERY,
+    description="Режим пагинации: page (по умолчанию, с count) или cursor (без count, стабильная по глубине)",
+    type=openapi.TYPE_STRING,
+    enum=["page", "cursor"],
+    required=False,
+)
+cursor_param = openapi.Parameter(
+    name="cursor",
+    in_=openapi.IN_QUERY,
+    description="Непрозрачный курсор из полей next/previous (включает режим cursor)",
+    type=openapi.TYPE_STRING,
+    required=False,
+)
+search_query_param = openapi.Parameter(
+    name="q",
+    in_=openapi.IN_QUERY,
+    description="Поисковый запрос (поддерживает синтаксис websearch: \"фраза\", or, -исключение)",
+    type=openapi.TYPE_STRING,
+    required=True,
+)
 
 class PostListCreateView(ErrorResponseMixin, APIView):
     permission_classes = [IsAuthenticated]
@@ -58,12 +96,24 @@ class PostListCreateView(ErrorResponseMixin, APIView):
     @swagger_auto_schema(
         tags=["posts"],
         operation_summary="Список постов",
-        operation_description="Возвращает список всех постов с изображениями и автором",
+        operation_description="Возвращает список постов с изображениями и автором. "
+                              "Поддерживает фильтрацию по автору и дате создания и сортировку "
+                              "по новизне или числу лайков. "
+                              "Фильтр по дате создания вместе с сортировкой по лайкам не покрыт индексом: "
+                              "выборка за период сортируется целиком, поэтому период стоит ограничивать. "
+                              "В режиме pagination=cursor ответ содержит только next, previous и results",
+        query_serializer=PostListQuerySerializer,
+        manual_parameters=[pagination_param, cursor_param],
         responses={
             200: openapi.Response(
                 description="Список постов",
                 schema=PaginatedPostListSerializer()
             ),
+            304: openapi.Response(description="Страница не изменилась"),
+            400: openapi.Response(
+                description="Некорректные параметры фильтрации",
+                schema=ErrorResponseSerializer
+            ),
             500: openapi.Response(
                 description="Внутренняя ошибка сервера",
                 schema=ErrorResponseSerializer
@@ -71,11 +121,42 @@ class PostListCreateView(ErrorResponseMixin, APIView):
         },
     )
     def get(self, request):
-        posts = Post.objects.all().select_related("author").prefetch_related("images")
-        paginator = PostPagination()
+        cache_key, cached = post_list_cache.get(request)
+        if cached is not None:
+            data, etag = cached
+            response = conditional_response(request, etag) or Response(data)
+            response["X-Cache"] = "HIT"
+            return set_validators(response, etag)
+
+        query = PostListQuerySerializer(data=request.query_params)
+        query.is_valid(raise_exception=True)
+        ordering = query.get_ordering()
+
+        fast = settings.POST_FAST_RENDERING
+        posts = Post.objects.with_pending_likes().values(*POST_LIST_FIELDS) if fast else Post.objects.for_list()
+        posts = posts.filter(**query.get_filters()).order_by(*ordering)
+        paginator = get_post_paginator(request, ordering)
         result_page = paginator.paginate_queryset(posts, request)
-        serializer = PostListResponseSerializer(result_page, many=True)
-        return paginator.get_paginated_response(serializer.data)
+        if fast:
+            attach_thumbnail_variants(result_page)
+        post_ids = [post["id"] if fast else post.id for post in result_page]
+        liked_post_ids = get_liked_post_ids(request.user, post_ids)
+        etag = get_post_list_etag(paginator, result_page, liked_post_ids)
+        not_modified = conditional_response(request, etag)
+        if not_modified is not None:
+            return not_modified
+
+        with timed("serialize"):
+            if fast:
+                data = render_post_list(result_page, liked_post_ids)
+            else:
+                data = PostListResponseSerializer(
+                    result_page, many=True, context={"liked_post_ids": liked_post_ids}
+                ).data
+        response = paginator.get_paginated_response(data)
+        post_list_cache.set(cache_key, (response.data, etag))
+        response["X-Cache"] = "MISS"
+        return set_validators(response, etag)
     
     @swagger_auto_schema(
         tags=["posts"],
@@ -106,7 +187,186 @@ class PostListCreateView(ErrorResponseMixin, APIView):
         serializer = CreatePostRequestSerializer(data=request.data, context={'request': request})
         serializer.is_valid(raise_exception=True)
         post = serializer.save()
-        return Response(PostDetailResponseSerializer(post).data, status=status.HTTP_201_CREATED)
+        return Response(
+            PostDetailResponseSerializer(post, context={"liked_post_ids": set()}).data,
+            status=status.HTTP_201_CREATED
+        )
+
+
+class PostSearchView(ErrorResponseMixin, APIView):
+    permission_classes = [AllowAny]
+
+    @swagger_auto_schema(
+        tags=["posts"],
+        operation_summary="Поиск постов",
+        operation_description="Полнотекстовый поиск по заголовку и тексту постов. "
+                              "Совпадения в заголовке ранжируются выше совпадений в тексте",
+        manual_parameters=[search_query_param],
+        responses={
+            200: openapi.Response(
+                description="Найденные посты",
+                schema=PaginatedPostListSerializer()
+            ),
+            400: openapi.Response(
+                description="Не указан поисковый запрос",
+                schema=ErrorResponseSerializer
+            ),
+            500: openapi.Response(
+                description="Внутренняя ошибка сервера",
+                schema=ErrorResponseSerializer
+            ),
+        },
+    )
+    def get(self, request):
+        query_text = request.query_params.get("q", "").strip()
+        if not query_text:
+            return self.format_error(
+                request,
+                status.HTTP_400_BAD_REQUEST,
+                "Bad Request",
+                "Query parameter 'q' is required"
+            )
+
+        query = SearchQuery(query_text, config=POST_SEARCH_CONFIG, search_type="websearch")
+        posts = (
+            Post.objects.for_list()
+            .filter(search_vector=query)
+            .annotate(rank=SearchRank(F("search_vector"), query))
+            .order_by("-rank", *POST_ORDERING)
+        )
+        paginator = PostPagination()
+        result_page = paginator.paginate_queryset(posts, request)
+        liked_post_ids = get_liked_post_ids(request.user, [post.id for post in result_page])
+        with timed("serialize"):
+            data = PostListResponseSerializer(
+                result_page, many=True, context={"liked_post_ids": liked_post_ids}
+            ).data
+        return paginator.get_paginated_response(data)
+
+
+class PostTrendingView(ErrorResponseMixin, APIView):
+    permission_classes = [AllowAny]
+
+    @swagger_auto_schema(
+        tags=["posts"],
+        operation_summary="Популярные посты",
+        operation_description="Возвращает посты за последние дни, отсортированные по рейтингу, "
+                              "который растёт с лайками и затухает со временем. "
+                              "Пагинация только курсорная: ответ содержит next, previous и results",
+        manual_parameters=[cursor_param],
+        responses={
+            200: openapi.Response(
+                description="Популярные посты",
+                schema=CursorPaginatedPostListSerializer()
+            ),
+            404: openapi.Response(
+                description="Некорректный курсор",
+                schema=ErrorResponseSerializer
+            ),
+            500: openapi.Response(
+                description="Внутренняя ошибка сервера",
+                schema=ErrorResponseSerializer
+            ),
+        },
+    )
+    def get(self, request):
+        # Keyset over post_trending_score_idx, then load the page's posts by id
+        paginator = PostCursorPagination()
+        paginator.ordering = TRENDING_ORDERING
+        scores = paginator.paginate_queryset(PostTrendingScore.objects.values("post_id", "score"), request)
+        posts = Post.objects.for_list().in_bulk([score["post_id"] for score in scores])
+        result_page = [posts[score["post_id"]] for score in scores if score["post_id"] in posts]
+        liked_post_ids = get_liked_post_ids(request.user, [post.id for post in result_page])
+        with timed("serialize"):
+            data = PostListResponseSerializer(
+                result_page, many=True, context={"liked_post_ids": liked_post_ids}
+            ).data
+        return paginator.get_paginated_response(data)
+
+
+class PostChangesView(ErrorResponseMixin, APIView):
+    permission_classes = [AllowAny]
+
+    @swagger_auto_schema(
+        tags=["posts"],
+        operation_summary="Изменения постов",
+        operation_description="Возвращает посты, созданные или изменённые после токена синхронизации, "
+                              "в порядке updated_at, и id удалённых постов. Без since отдаёт все посты. "
+                              "Токен из поля next передаётся в since при следующем запросе; пока has_more "
+                              "равно true, следует запрашивать дальше. Ответ 410 означает, что токен "
+                              "устарел и нужна полная синхронизация. Лайки не синхронизируются: "
+                              "они не меняют updated_at, поэтому likes_count в ответе может быть "
+                              "устаревшим, актуальное значение отдают список и детали поста",
+        query_serializer=PostChangesQuerySerializer,
+        responses={
+            200: openapi.Response(
+                description="Изменения с момента токена",
+                schema=PostChangesResponseSerializer
+            ),
+            400: openapi.Response(
+                description="Некорректный токен синхронизации",
+                schema=ErrorResponseSerializer
+            ),
+            410: openapi.Response(
+                description="Токен синхронизации устарел",
+                schema=ErrorResponseSerializer
+            ),
+            500: openapi.Response(
+                description="Внутренняя ошибка сервера",
+                schema=ErrorResponseSerializer
+            ),
+        },
+    )
+    def get(self, request):
+        query = PostChangesQuerySerializer(data=request.query_params)
+        query.is_valid(raise_exception=True)
+
+        changes = get_post_changes(query.validated_data.get("since"), query.validated_data["limit"])
+        posts = attach_thumbnail_variants(changes["posts"])
+        liked_post_ids = get_liked_post_ids(request.user, [post["id"] for post in posts])
+        with timed("serialize"):
+            changes["posts"] = render_post_list(posts, liked_post_ids)
+        return Response(changes)
+
+
+class PostExportView(ErrorResponseMixin, APIView):
+    permission_classes = [IsAdminUser]
+
+    @swagger_auto_schema(
+        tags=["posts"],
+        operation_summary="Выгрузка постов",
+        operation_description="Потоково отдаёт все посты в формате NDJSON (по одному JSON-объекту на строку) "
+                              "вместе с автором и изображениями. С параметром since выгружаются только посты, "
+                              "изменённые после указанного момента. Доступно только персоналу",
+        query_serializer=PostExportQuerySerializer,
+        responses={
+            200: openapi.Response(description="Поток NDJSON с постами"),
+            400: openapi.Response(
+                description="Некорректный параметр since",
+                schema=ErrorResponseSerializer
+            ),
+            401: openapi.Response(
+                description="Неавторизован",
+                schema=ErrorResponseSerializer
+            ),
+            403: openapi.Response(
+                description="Недостаточно прав",
+                schema=ErrorResponseSerializer
+            ),
+        },
+    )
+    def get(self, request):
+        query = PostExportQuerySerializer(data=request.query_params)
+        query.is_valid(raise_exception=True)
+
+        # The body is produced after the middleware has returned, so pick the database while routing applies
+        using = router.db_for_read(Post)
+        response = StreamingHttpResponse(
+            iter_post_export(query.validated_data.get("since"), using, settings.POST_EXPORT_CHUNK_SIZE),
+            content_type="application/x-ndjson",
+        )
+        response["Content-Disposition"] = 'attachment; filename="posts.ndjson"'
+        return response
 
 
 class PostUpdateDetailView(ErrorResponseMixin, APIView):
@@ -120,12 +380,14 @@ class PostUpdateDetailView(ErrorResponseMixin, APIView):
     @swagger_auto_schema(
         tags=["posts"],
         operation_summary="Получение деталей поста",
-        operation_description="Возвращает детальную информацию о посте по ID",
+        operation_description="Возвращает детальную информацию о посте по ID. "
+                              "Поддерживает условные запросы через If-None-Match",
         responses={
             200: openapi.Response(
                 description="Детали поста",
                 schema=PostDetailResponseSerializer
             ),
+            304: openapi.Response(description="Пост не изменился"),
             404: openapi.Response(
                 description="Пост не найден",
                 schema=ErrorResponseSerializer
@@ -137,13 +399,36 @@ class PostUpdateDetailView(ErrorResponseMixin, APIView):
         },
     )
     def get(self, request, post_id):
+        etag = get_post_detail_etag(post_id, request.user)
+        if etag is None:
+            raise NotFound(f"Post with post_id={post_id} does not exist")
+
+        not_modified = conditional_response(request, etag)
+        if not_modified is not None:
+            return not_modified
+
+        if settings.POST_FAST_RENDERING:
+            liked_post_ids = get_liked_post_ids(request.user, [post_id])
+            with timed("serialize"):
+                data = render_post_detail(post_id, liked_post_ids)
+            if data is None:
+                raise NotFound(f"Post with post_id={post_id} does not exist")
+            return set_validators(Response(data), etag)
+
         try:
-            post = Post.objects.select_related("author").prefetch_related("images").get(id=post_id)
+            post = (
+                Post.objects.with_pending_likes()
+                .select_related("author")
+                .prefetch_related("images__variants")
+                .get(id=post_id)
+            )
         except Post.DoesNotExist:
             raise NotFound(f"Post with post_id={post_id} does not exist")
 
-        serializer = PostDetailResponseSerializer(post)
-        return Response(serializer.data)
+        liked_post_ids = get_liked_post_ids(request.user, [post.id])
+        with timed("serialize"):
+            data = PostDetailResponseSerializer(post, context={"liked_post_ids": liked_post_ids}).data
+        return set_validators(Response(data), etag)
 
     @swagger_auto_schema(
         tags=["posts"],
@@ -202,7 +487,11 @@ class PostUpdateDetailView(ErrorResponseMixin, APIView):
         )
         serializer.is_valid(raise_exception=True)
         post = serializer.save()
-        return Response(PostDetailResponseSerializer(post).data, status=status.HTTP_200_OK)
+        liked_post_ids = get_liked_post_ids(request.user, [post.id])
+        return Response(
+            PostDetailResponseSerializer(post, context={"liked_post_ids": liked_post_ids}).data,
+            status=status.HTTP_200_OK
+        )
 
     @swagger_auto_schema(
         tags=["posts"],
@@ -279,28 +568,24 @@ class PostLikeView(ErrorResponseMixin, APIView):
         },
     )
     def post(self, request, post_id):
-        try:
-            post = Post.objects.get(id=post_id)
-        except Post.DoesNotExist:
-            return self.format_error(
-                request,
-                status.HTTP_404_NOT_FOUND,
-                "Not Found",
-                f"Post with id={post_id} does not exist"
-            )
-        
-        if post.likes.filter(id=request.user.id).exists():
+        if not add_like(post_id, request.user.id):
+            if not Post.objects.filter(id=post_id).exists():
+                return self.format_error(
+                    request,
+                    status.HTTP_404_NOT_FOUND,
+                    "Not Found",
+                    f"Post with id={post_id} does not exist"
+                )
+
             return self.format_error(
                 request,
                 status.HTTP_400_BAD_REQUEST,
                 "Bad Request",
                 "You have already liked this post"
             )
-        
-        post.likes.add(request.user)
-        post.likes_count = post.likes.count()
-        post.save()
 
+        post_list_cache.bump()
+        record_like("like")
         return Response(status=status.HTTP_200_OK)
 
 
@@ -332,26 +617,22 @@ class PostUnlikeView(ErrorResponseMixin, APIView):
         },
     )
     def delete(self, request, post_id):
-        try:
-            post = Post.objects.get(id=post_id)
-        except Post.DoesNotExist:
-            return self.format_error(
-                request,
-                status.HTTP_404_NOT_FOUND,
-                "Not Found",
-                f"Post with id={post_id} does not exist"
-            )
-        
-        if not post.likes.filter(id=request.user.id).exists():
+        if not remove_like(post_id, request.user.id):
+            if not Post.objects.filter(id=post_id).exists():
+                return self.format_error(
+                    request,
+                    status.HTTP_404_NOT_FOUND,
+                    "Not Found",
+                    f"Post with id={post_id} does not exist"
+                )
+
             return self.format_error(
                 request,
                 status.HTTP_400_BAD_REQUEST,
                 "Bad Request",
                 "You have not liked this post yet"
             )
-        
-        post.likes.remove(request.user)
-        post.likes_count = post.likes.count()
-        post.save()
 
+        post_list_cache.bump()
+        record_like("unlike")
         return Response(status=status.HTTP_200_OK)
\ No newline at end of file
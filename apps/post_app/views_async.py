@@ -0,0 +1,76 @@
+from rest_framework.exceptions import NotFound
+from rest_framework.permissions import AllowAny
+from rest_framework.response import Response
+
+from core.conditional import conditional_response, set_validators
+from core.timing import timed
+from core.views import AsyncAPIView
+from .cache import post_list_cache
+from .etags import aget_post_detail_etag, get_post_list_etag
+from .likes import aget_liked_post_ids
+from .models import Post
+from .pagination import get_post_paginator
+from .serializers import PostListQuerySerializer
+from .serializers_response import PostListResponseSerializer, PostDetailResponseSerializer
+
+
+class AsyncPostListView(AsyncAPIView):
+    permission_classes = [AllowAny]
+
+    async def get(self, request):
+        cache_key, cached = await post_list_cache.aget(request)
+        if cached is not None:
+            data, etag = cached
+            response = conditional_response(request, etag) or Response(data)
+            response["X-Cache"] = "HIT"
+            return set_validators(response, etag)
+
+        query = PostListQuerySerializer(data=request.query_params)
+        query.is_valid(raise_exception=True)
+        ordering = query.get_ordering()
+
+        posts = Post.objects.for_list().filter(**query.get_filters()).order_by(*ordering)
+        paginator = get_post_paginator(request, ordering)
+        result_page = await paginator.apaginate_queryset(posts, request)
+        liked_post_ids = await aget_liked_post_ids(request.user, [post.id for post in result_page])
+        etag = get_post_list_etag(paginator, result_page, liked_post_ids)
+        not_modified = conditional_response(request, etag)
+        if not_modified is not None:
+            return not_modified
+
+        with timed("serialize"):
+            data = PostListResponseSerializer(
+                result_page, many=True, context={"liked_post_ids": liked_post_ids}
+            ).data
+        response = paginator.get_paginated_response(data)
+        await post_list_cache.aset(cache_key, (response.data, etag))
+        response["X-Cache"] = "MISS"
+        return set_validators(response, etag)
+
+
+class AsyncPostDetailView(AsyncAPIView):
+    permission_classes = [AllowAny]
+
+    async def get(self, request, post_id):
+        etag = await aget_post_detail_etag(post_id, request.user)
+        if etag is None:
+            raise NotFound(f"Post with post_id={post_id} does not exist")
+
+        not_modified = conditional_response(request, etag)
+        if not_modified is not None:
+            return not_modified
+
+        try:
+            post = await (
+                Post.objects.with_pending_likes()
+                .select_related("author")
+                .prefetch_related("images__variants")
+                .aget(id=post_id)
+            )
+        except Post.DoesNotExist:
+            raise NotFound(f"Post with post_id={post_id} does not exist")
+
+        liked_post_ids = await aget_liked_post_ids(request.user, [post.id])
+        with timed("serialize"):
+            data = PostDetailResponseSerializer(post, context={"liked_post_ids": liked_post_ids}).data
+        return set_validators(Response(data), etag)
@@ -0,0 +1,6 @@
+from django.urls import path
+from .views_async import AsyncProfileView
+
+urlpatterns = [
+    path('', AsyncProfileView.as_view(), name='profile-async'),
+]
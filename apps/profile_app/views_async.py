@@ -0,0 +1,12 @@
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+
+from apps.profile_app.serializers_response import ProfileResponseSerializer
+from core.views import AsyncAPIView
+
+
+class AsyncProfileView(AsyncAPIView):
+    permission_classes = [IsAuthenticated]
+
+    async def get(self, request):
+        return Response(ProfileResponseSerializer(request.user).data)
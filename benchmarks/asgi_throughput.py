@@ -0,0 +1,43 @@
+# Compares concurrent read throughput of the sync views under gunicorn sync workers
+# with the /async/ views under uvicorn workers, same worker count and client load.
+#
+#   ALLOWED_HOSTS=127.0.0.1 python -m benchmarks.asgi_throughput --clients 32 --workers 2
+#
+# Needs a migrated database from the usual DB_* settings; seeds posts if there are too few.
+import argparse
+import random
+
+from benchmarks.common import gunicorn, report, request, run_clients, seed_posts, setup_django
+
+
+def clients(base, prefix, post_ids, count):
+    def detail():
+        return request(f"{base}{prefix}/{random.choice(post_ids)}/")
+
+    def page():
+        return request(f"{base}{prefix}/?page={random.randint(1, 20)}&page_size=10")
+
+    return [("detail", detail) if i % 2 else ("list", page) for i in range(count)]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--clients", type=int, default=32)
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--duration", type=float, default=15)
+    parser.add_argument("--posts", type=int, default=500)
+    parser.add_argument("--port", type=int, default=8077)
+    args = parser.parse_args()
+
+    setup_django()
+    post_ids = seed_posts(args.posts)
+
+    for mode, prefix in (("wsgi", "/posts"), ("asgi", "/async/posts")):
+        with gunicorn(args.port, args.workers, SERVER_MODE=mode) as base:
+            results = run_clients(args.duration, clients(base, prefix, post_ids, args.clients))
+        for name, samples in results.items():
+            report(f"{mode} {name}", samples, args.duration)
+
+
+if __name__ == "__main__":
+    main()
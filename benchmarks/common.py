@@ -0,0 +1,117 @@
+import json
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+from collections import Counter
+from contextlib import contextmanager
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+# The app redirects plain HTTP, so requests look like they came through the TLS proxy
+PROXY_HEADERS = {"X-Forwarded-Proto": "https"}
+
+
+def setup_django():
+    sys.path.insert(0, str(ROOT))
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "config.settings")
+    import django
+
+    django.setup()
+
+
+def seed_posts(count):
+    from django.contrib.auth import get_user_model
+
+    from apps.post_app.models import Post
+
+    author, _ = get_user_model().objects.get_or_create(
+        username="bench-author", defaults={"email": "bench-author@example.com"}
+    )
+    missing = count - Post.objects.count()
+    if missing > 0:
+        Post.objects.bulk_create(Post(author=author, title=f"Post {i}", text="Text " * 50) for i in range(missing))
+    return list(Post.objects.values_list("id", flat=True)[:count])
+
+
+@contextmanager
+def gunicorn(port, workers=2, **env):
+    process = subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "--bind", f"127.0.0.1:{port}", "--workers", str(workers)],
+        cwd=ROOT,
+        env={**os.environ, **env},
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    try:
+        deadline = time.monotonic() + 30
+        while True:
+            if process.poll() is not None:
+                raise RuntimeError(f"gunicorn exited with {process.returncode}")
+            try:
+                socket.create_connection(("127.0.0.1", port), timeout=1).close()
+                break
+            except OSError:
+                if time.monotonic() > deadline:
+                    raise
+                time.sleep(0.2)
+        yield f"http://127.0.0.1:{port}"
+    finally:
+        process.terminate()
+        process.wait()
+
+
+def request(url, body=None, headers=None, method=None):
+    request = urllib.request.Request(
+        url,
+        data=json.dumps(body).encode() if body is not None else None,
+        headers={**PROXY_HEADERS, "Content-Type": "application/json", **(headers or {})},
+        method=method,
+    )
+    started = time.perf_counter()
+    try:
+        with urllib.request.urlopen(request, timeout=60) as response:
+            response.read()
+            status = response.status
+    except urllib.error.HTTPError as exc:
+        status = exc.code
+    except OSError:
+        status = -1
+    return status, time.perf_counter() - started
+
+
+# Each client is (name, call); call makes one request and returns (status, seconds)
+def run_clients(duration, clients):
+    results = {name: [] for name, _ in clients}
+    stop = time.monotonic() + duration
+
+    def loop(name, call):
+        while time.monotonic() < stop:
+            results[name].append(call())
+
+    threads = [threading.Thread(target=loop, args=client) for client in clients]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))] if values else float("nan")
+
+
+def report(label, samples, duration, ok=(200,)):
+    latencies = [seconds for status, seconds in samples if status in ok]
+    statuses = ", ".join(f"{status}: {count}" for status, count in sorted(Counter(s for s, _ in samples).items()))
+    print(
+        f"{label:24s} {len(latencies) / duration:8.1f} req/s  "
+        f"p50 {percentile(latencies, 0.5) * 1000:7.1f} ms  p99 {percentile(latencies, 0.99) * 1000:7.1f} ms  "
+        f"[{statuses}]"
+    )
@@ -0,0 +1,97 @@
+# Likes one post from many threads, first with direct counter updates and then with
+# POST_LIKES_WRITE_BEHIND, and reports throughput and how often sessions sat waiting on a
+# lock (sampled from pg_stat_activity). The write-behind run is flushed afterwards and its
+# counter checked against the likes table.
+#
+#   python -m benchmarks.like_contention --threads 8 --likes 50
+#
+# Needs a migrated database from the usual DB_* settings; the post and likers it creates are
+# deleted at the end.
+import argparse
+import threading
+import time
+
+from benchmarks.common import setup_django
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--likes", type=int, default=50, help="likes per thread")
+    args = parser.parse_args()
+
+    setup_django()
+    from django.contrib.auth import get_user_model
+    from django.db import connection
+    from django.test.utils import override_settings
+
+    from apps.post_app.likes import PostLike, add_like, flush_like_deltas
+    from apps.post_app.models import Post
+
+    User = get_user_model()
+    prefix = f"bench-liker-{time.time_ns()}"
+    author = User.objects.create(username=prefix, email=f"{prefix}@example.com")
+    User.objects.bulk_create(
+        User(username=f"{prefix}-{i}", email=f"{prefix}-{i}@example.com") for i in range(args.threads * args.likes)
+    )
+    user_ids = list(User.objects.filter(username__startswith=f"{prefix}-").values_list("id", flat=True))
+
+    def sample_lock_waits(stop, samples):
+        try:
+            with connection.cursor() as cursor:
+                while not stop.is_set():
+                    cursor.execute(
+                        "SELECT COUNT(*) FROM pg_stat_activity "
+                        "WHERE datname = current_database() AND wait_event_type = 'Lock'"
+                    )
+                    samples.append(cursor.fetchone()[0])
+                    time.sleep(0.001)
+        finally:
+            connection.close()
+
+    def like(post_id, chunk):
+        try:
+            for user_id in chunk:
+                add_like(post_id, user_id)
+        finally:
+            connection.close()
+
+    def run(label):
+        post = Post.objects.create(author=author, title=label, text="Text")
+        stop, samples = threading.Event(), []
+        sampler = threading.Thread(target=sample_lock_waits, args=(stop, samples))
+        threads = [
+            threading.Thread(target=like, args=(post.id, user_ids[i::args.threads])) for i in range(args.threads)
+        ]
+        sampler.start()
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+        stop.set()
+        sampler.join()
+        print(
+            f"{label:14s} {len(user_ids) / elapsed:8.0f} likes/s  "
+            f"{sum(samples)} lock waits in {len(samples)} samples"
+        )
+        return post
+
+    try:
+        post = run("direct")
+        print(f"{'':14s} likes_count {Post.objects.get(id=post.id).likes_count} of {len(user_ids)}")
+
+        with override_settings(POST_LIKES_WRITE_BEHIND=True):
+            post = run("write-behind")
+        while flush_like_deltas(batch_size=1000)[0]:
+            pass
+        likes = PostLike.objects.filter(post_id=post.id).count()
+        print(f"{'':14s} likes_count {Post.objects.get(id=post.id).likes_count} of {likes} after flush")
+    finally:
+        Post.objects.filter(author=author).delete()
+        User.objects.filter(username__startswith=prefix).delete()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+# Load test for login throttling: legitimate users log in every few seconds from their
+# own IPs while attackers guess passwords for real accounts as fast as they can. Each
+# attacker owns a few IPs and also prepends a random address to X-Forwarded-For, which
+# must not earn it a fresh per-IP budget.
+#
+#   ALLOWED_HOSTS=127.0.0.1 python -m benchmarks.login_attack --attackers 16 --duration 30
+#
+# gunicorn runs with NUM_PROXIES=1, standing in for the proxy that appends the client IP.
+# Needs a migrated database from the usual DB_* settings; creates the accounts it uses.
+import argparse
+import os
+import random
+import tempfile
+import time
+
+from benchmarks.common import gunicorn, report, request, run_clients, setup_django
+
+PASSWORD = "pass12345"
+
+
+def seed(legit, victims):
+    from django.contrib.auth import get_user_model
+
+    User = get_user_model()
+    for name in [f"bench-legit{i}" for i in range(legit)] + [f"bench-victim{i}" for i in range(victims)]:
+        if not User.objects.filter(username=name).exists():
+            User.objects.create_user(username=name, email=f"{name}@example.com", password=PASSWORD)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--legit", type=int, default=4)
+    parser.add_argument("--victims", type=int, default=40)
+    parser.add_argument("--attackers", type=int, default=16)
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--duration", type=float, default=30)
+    parser.add_argument("--port", type=int, default=8077)
+    args = parser.parse_args()
+
+    setup_django()
+    seed(args.legit, args.victims)
+    throttle_db = os.path.join(tempfile.mkdtemp(), "throttle.sqlite3")
+
+    with gunicorn(args.port, args.workers, NUM_PROXIES="1", LOGIN_THROTTLE_DB=throttle_db) as base:
+        url = f"{base}/auth/login/"
+
+        def legit(i):
+            def call():
+                result = request(
+                    url, {"email": f"bench-legit{i}@example.com", "password": PASSWORD},
+                    {"X-Forwarded-For": f"10.0.0.{i}"},
+                )
+                time.sleep(3)
+                return result
+            return call
+
+        def attacker(i):
+            def call():
+                spoofed = f"{random.randint(1, 223)}.{random.randint(0, 255)}.0.1"
+                return request(
+                    url, {"email": f"bench-victim{random.randrange(args.victims)}@example.com", "password": "guess"},
+                    {"X-Forwarded-For": f"{spoofed}, 66.6.{i}.{random.randint(0, 3)}"},
+                )
+            return call
+
+        # Warm the workers and mark each legitimate pair as trusted before the attack starts
+        for i in range(args.legit):
+            legit(i)()
+        clients = [("legit", legit(i)) for i in range(args.legit)]
+        clients += [("attack", attacker(i)) for i in range(args.attackers)]
+        results = run_clients(args.duration, clients)
+
+    report("legit logins", results["legit"], args.duration)
+    report("attack attempts", results["attack"], args.duration, ok=(401,))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,48 @@
+# Measures what Prometheus instrumentation adds to a request: the per-request
+# observe_request call on its own, and a full post detail request through the
+# middleware stack with METRICS_ENABLED off and on.
+#
+#   python -m benchmarks.metrics_overhead --number 500
+#
+# Needs a migrated database from the usual DB_* settings; seeds a post if there is none.
+import argparse
+import timeit
+
+from benchmarks.common import PROXY_HEADERS, seed_posts, setup_django
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--number", type=int, default=500)
+    args = parser.parse_args()
+
+    setup_django()
+    from django.http import HttpResponse
+    from django.test import Client, RequestFactory
+    from django.test.utils import override_settings
+    from django.urls import resolve
+
+    from core.metrics import observe_request
+
+    post_id = seed_posts(1)[0]
+    url = f"/posts/{post_id}/"
+
+    request = RequestFactory().get(url)
+    request.resolver_match = resolve(url)
+    response = HttpResponse(b"x" * 2000)
+    seconds = timeit.timeit(lambda: observe_request(request, response, 0.01, 3), number=args.number * 20)
+    print(f"{'observe_request':24s} {seconds / (args.number * 20) * 1e6:8.2f} us")
+
+    headers = {f"HTTP_{name.upper().replace('-', '_')}": value for name, value in PROXY_HEADERS.items()}
+    for enabled in (False, True):
+        # Middleware is loaded per handler, so each setting needs a fresh client
+        with override_settings(METRICS_ENABLED=enabled, METRICS_TOKEN="bench", ALLOWED_HOSTS=["testserver"]):
+            client = Client(**headers)
+            client.get(url)
+            seconds = timeit.timeit(lambda: client.get(url), number=args.number)
+        label = f"detail metrics {'on' if enabled else 'off'}"
+        print(f"{label:24s} {seconds / args.number * 1e6:8.2f} us")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+# Mixed login/register/read workload against two setups: hashing inline on sync workers
+# (the default) and hashing in a PASSWORD_HASHING_PROCESSES pool on threaded workers,
+# where a request waiting for a hash leaves the worker free to serve reads.
+#
+#   ALLOWED_HOSTS=127.0.0.1 python -m benchmarks.password_hashing --duration 30
+#
+# Login throttling is disabled for the run. Needs a migrated database from the usual
+# DB_* settings; creates the accounts it logs in with.
+import argparse
+import uuid
+
+from benchmarks.common import gunicorn, report, request, run_clients, seed_posts, setup_django
+
+PASSWORD = "pass12345"
+MODES = {
+    "inline, sync workers": {"PASSWORD_HASHING_PROCESSES": "0"},
+    "pool, threaded workers": {"PASSWORD_HASHING_PROCESSES": "2", "GUNICORN_CMD_ARGS": "--threads 4"},
+}
+
+
+def seed(count):
+    from django.contrib.auth import get_user_model
+
+    User = get_user_model()
+    for i in range(count):
+        if not User.objects.filter(username=f"bench-user{i}").exists():
+            User.objects.create_user(username=f"bench-user{i}", email=f"bench-user{i}@example.com", password=PASSWORD)
+
+
+def login(base, email):
+    return request(f"{base}/auth/login/", {"email": email, "password": PASSWORD})
+
+
+def clients(base, args):
+    def login_as(i):
+        return lambda: login(base, f"bench-user{i % args.users}@example.com")
+
+    def register():
+        name = f"bench-{uuid.uuid4().hex[:12]}"
+        body = {"username": name, "email": f"{name}@example.com", "password": PASSWORD}
+        return request(f"{base}/auth/register/", body)
+
+    def read():
+        return request(f"{base}/posts/?page_size=10")
+
+    return (
+        [("login", login_as(i)) for i in range(args.logins)]
+        + [("register", register) for _ in range(args.registers)]
+        + [("read", read) for _ in range(args.reads)]
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--logins", type=int, default=3)
+    parser.add_argument("--registers", type=int, default=2)
+    parser.add_argument("--reads", type=int, default=3)
+    parser.add_argument("--users", type=int, default=4)
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--duration", type=float, default=30)
+    parser.add_argument("--port", type=int, default=8077)
+    args = parser.parse_args()
+
+    setup_django()
+    seed(args.users)
+    seed_posts(10)
+
+    for mode, env in MODES.items():
+        with gunicorn(args.port, args.workers, LOGIN_THROTTLE_ENABLED="False", **env) as base:
+            # Let every worker finish starting its hashing pool before measuring
+            for _ in range(args.workers * 2):
+                login(base, "bench-user0@example.com")
+            results = run_clients(args.duration, clients(base, args))
+        print(mode)
+        for name, samples in results.items():
+            report(f"  {name}", samples, args.duration)
+
+
+if __name__ == "__main__":
+    main()
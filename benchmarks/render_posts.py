@@ -0,0 +1,66 @@
+# Times one page of the post list and one post detail through the serializer path
+# (DRF serializers + JSONRenderer) and the fast path (values() rows + FastJSONRenderer).
+#
+#   python -m benchmarks.render_posts --page-size 50 --number 200
+#
+# Needs a migrated database from the usual DB_* settings; seeds posts if there are too few.
+import argparse
+import timeit
+
+from benchmarks.common import seed_posts, setup_django
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--page-size", type=int, default=50)
+    parser.add_argument("--number", type=int, default=200)
+    args = parser.parse_args()
+
+    setup_django()
+    from rest_framework.renderers import JSONRenderer
+
+    from apps.post_app.models import Post
+    from apps.post_app.pagination import POST_ORDERING
+    from apps.post_app.rendering import (
+        POST_LIST_FIELDS, attach_thumbnail_variants, render_post_detail, render_post_list,
+    )
+    from apps.post_app.serializers_response import PostDetailResponseSerializer, PostListResponseSerializer
+    from core.renderers import FastJSONRenderer, orjson
+
+    post_ids = seed_posts(args.page_size)
+    liked_post_ids = set(post_ids[::3])
+
+    def list_serializer():
+        posts = list(Post.objects.for_list().order_by(*POST_ORDERING)[:args.page_size])
+        data = PostListResponseSerializer(posts, many=True, context={"liked_post_ids": liked_post_ids}).data
+        return JSONRenderer().render(data)
+
+    def list_fast():
+        rows = Post.objects.with_pending_likes().values(*POST_LIST_FIELDS).order_by(*POST_ORDERING)
+        rows = list(rows[:args.page_size])
+        return FastJSONRenderer().render(render_post_list(attach_thumbnail_variants(rows), liked_post_ids))
+
+    def detail_serializer():
+        post = Post.objects.with_pending_likes().select_related("author").prefetch_related("images__variants").get(
+            id=post_ids[0]
+        )
+        data = PostDetailResponseSerializer(post, context={"liked_post_ids": liked_post_ids}).data
+        return JSONRenderer().render(data)
+
+    def detail_fast():
+        return FastJSONRenderer().render(render_post_detail(post_ids[0], liked_post_ids))
+
+    print(f"orjson {'available' if orjson else 'missing, fast path renders with json'}")
+    for name, call in (
+        (f"list x{args.page_size} serializer", list_serializer),
+        (f"list x{args.page_size} fast", list_fast),
+        ("detail serializer", detail_serializer),
+        ("detail fast", detail_fast),
+    ):
+        call()
+        seconds = timeit.timeit(call, number=args.number)
+        print(f"{name:24s} {seconds / args.number * 1000:8.3f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -60,6 +60,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'rest_framework',
     'rest_framework_simplejwt',
     'rest_framework_simplejwt.token_blacklist',
@@ -71,6 +72,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.middleware.MetricsMiddleware',
+    'core.middleware.ReplicaRoutingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -79,16 +82,24 @@ MIDDLEWARE = [
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
     'corsheaders.middleware.CorsMiddleware',
+    'core.middleware.RequestTimingMiddleware',
 ]
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'core.authentication.CachedJWTAuthentication',
     ],
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.AllowAny',
     ],
     'EXCEPTION_HANDLER': 'core.exceptions.custom_exception_handler',
+    # Client IP for throttling comes from X-Forwarded-For only behind this many trusted proxies;
+    # with 0 it is REMOTE_ADDR, so clients can't dodge per-IP limits by sending the header themselves
+    'NUM_PROXIES': config('NUM_PROXIES', default=0, cast=int),
+    'DEFAULT_RENDERER_CLASSES': [
+        'core.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
 }
 
 ROOT_URLCONF = 'config.urls'
@@ -135,6 +146,8 @@ SWAGGER_SETTINGS = {
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
+DB_POOL_ENABLED = config('DB_POOL_ENABLED', default=False, cast=bool)
+
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.postgresql',
@@ -143,9 +156,195 @@ DATABASES = {
         'PASSWORD': config('DB_PASSWORD'),
         'HOST': config('DB_HOST', default='localhost'),
         'PORT': config('DB_PORT', default='5432'),
+        # Pooling owns connection lifetime, so CONN_MAX_AGE only applies without it
+        'CONN_MAX_AGE': 0 if DB_POOL_ENABLED else config('DB_CONN_MAX_AGE', default=0, cast=int),
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {
+            # Server-side binding lets psycopg prepare repeated queries on long-lived connections
+            'server_side_binding': config('DB_SERVER_SIDE_BINDING', default=DB_POOL_ENABLED, cast=bool),
+            'prepare_threshold': config('DB_PREPARE_THRESHOLD', default=5, cast=int),
+        },
+    }
+}
+
+if DB_POOL_ENABLED:
+    DATABASES['default']['OPTIONS']['pool'] = {
+        'min_size': config('DB_POOL_MIN_SIZE', default=2, cast=int),
+        'max_size': config('DB_POOL_MAX_SIZE', default=10, cast=int),
+        'timeout': config('DB_POOL_TIMEOUT', default=10, cast=float),
+        'max_idle': config('DB_POOL_MAX_IDLE', default=600, cast=float),
+        'max_lifetime': config('DB_POOL_MAX_LIFETIME', default=3600, cast=float),
+    }
+
+# Read replicas
+# Safe-method requests read from a random replica; a user stays on the primary for
+# REPLICA_PIN_SECONDS after a successful write so they always see their own changes.
+# Pins live in REPLICA_PIN_CACHE_ALIAS, which must be a cache shared by all workers;
+# startup fails if replicas are configured with a process-local (LocMem/Dummy) cache.
+
+DATABASE_REPLICAS = []
+for index, url in enumerate(filter(None, config('DB_REPLICA_URLS', default='').split(','))):
+    DATABASES[f'replica_{index}'] = {
+        **dj_database_url.parse(url.strip()),
+        'CONN_MAX_AGE': DATABASES['default']['CONN_MAX_AGE'],
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {**DATABASES['default']['OPTIONS']},
+        'TEST': {'MIRROR': 'default'},
+    }
+    DATABASE_REPLICAS.append(f'replica_{index}')
+
+DATABASE_ROUTERS = ['core.db_router.ReplicaRouter']
+REPLICA_PIN_SECONDS = config('REPLICA_PIN_SECONDS', default=10, cast=int)
+REPLICA_PIN_CACHE_ALIAS = config('REPLICA_PIN_CACHE_ALIAS', default='default')
+
+
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+
+CACHES = {
+    'default': {
+        'BACKEND': config('CACHE_BACKEND', default='django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': config('CACHE_LOCATION', default='tsu-posthub'),
     }
 }
 
+POST_LIST_CACHE_ENABLED = config('POST_LIST_CACHE_ENABLED', default=True, cast=bool)
+POST_LIST_CACHE_ALIAS = config('POST_LIST_CACHE_ALIAS', default='default')
+POST_LIST_CACHE_TIMEOUT = config('POST_LIST_CACHE_TIMEOUT', default=60, cast=int)
+
+
+# Authenticated user cache
+# CachedJWTAuthentication keeps recently seen users in a per-process LRU, so a hit skips the
+# user SELECT. Saves and deletes clear the entry in the process that made them; other workers
+# pick the change up once AUTH_USER_CACHE_TIMEOUT expires.
+
+AUTH_USER_CACHE_ENABLED = config('AUTH_USER_CACHE_ENABLED', default=True, cast=bool)
+AUTH_USER_CACHE_SIZE = config('AUTH_USER_CACHE_SIZE', default=1024, cast=int)
+AUTH_USER_CACHE_TIMEOUT = config('AUTH_USER_CACHE_TIMEOUT', default=30, cast=int)
+
+
+# Token blacklist filter
+# Refresh and logout check revoked refresh tokens against an in-process Bloom filter and only
+# query token_blacklist on a possible hit. Blacklisting bumps a generation key in
+# TOKEN_BLACKLIST_FILTER_CACHE_ALIAS; each worker then loads just the rows past the last id it saw,
+# and rebuilds in full every TOKEN_BLACKLIST_FILTER_REFRESH_SECONDS to drop expired tokens.
+# It pays off when refreshes far outnumber logouts: a refresh with no logout since the last one
+# touches no table at all. Under steady logout traffic it costs about the same as the indexed
+# lookup it replaces, and it needs a cache shared between workers, so it is off by default and
+# startup fails if it is enabled with a process-local cache.
+
+TOKEN_BLACKLIST_FILTER_ENABLED = config('TOKEN_BLACKLIST_FILTER_ENABLED', default=False, cast=bool)
+TOKEN_BLACKLIST_FILTER_REFRESH_SECONDS = config('TOKEN_BLACKLIST_FILTER_REFRESH_SECONDS', default=300, cast=int)
+TOKEN_BLACKLIST_FILTER_CACHE_ALIAS = config('TOKEN_BLACKLIST_FILTER_CACHE_ALIAS', default='default')
+
+
+# Login throttling
+# Attempts are counted per IP, per email and globally in a sliding window before any password
+# hashing; counters live in a SQLite file shared by the workers on one host. An email and IP pair
+# that logged in successfully is only held to the IP limit for LOGIN_THROTTLE_TRUST_SECONDS. Each
+# worker also runs at most LOGIN_MAX_CONCURRENT_PASSWORD_CHECKS hashes at once (matters with threads).
+
+LOGIN_THROTTLE_ENABLED = config('LOGIN_THROTTLE_ENABLED', default=True, cast=bool)
+LOGIN_THROTTLE_DB = config('LOGIN_THROTTLE_DB', default='/tmp/posthub-throttle.sqlite3')
+LOGIN_THROTTLE_IP_RATE = config('LOGIN_THROTTLE_IP_RATE', default='20/m')
+LOGIN_THROTTLE_EMAIL_RATE = config('LOGIN_THROTTLE_EMAIL_RATE', default='10/m')
+LOGIN_THROTTLE_GLOBAL_RATE = config('LOGIN_THROTTLE_GLOBAL_RATE', default='600/m')
+LOGIN_THROTTLE_TRUST_SECONDS = config('LOGIN_THROTTLE_TRUST_SECONDS', default=30 * 86400, cast=int)
+LOGIN_MAX_CONCURRENT_PASSWORD_CHECKS = config('LOGIN_MAX_CONCURRENT_PASSWORD_CHECKS', default=2, cast=int)
+LOGIN_PASSWORD_CHECK_WAIT_SECONDS = config('LOGIN_PASSWORD_CHECK_WAIT_SECONDS', default=2.0, cast=float)
+
+
+# Likes
+# Write-behind mode appends like deltas and relies on `manage.py flush_like_deltas`
+# to fold them into Post.likes_count, so hot posts avoid row-lock contention.
+
+POST_LIKES_WRITE_BEHIND = config('POST_LIKES_WRITE_BEHIND', default=False, cast=bool)
+
+
+# Trending
+# Scores are kept current by like/unlike and post creation, and re-decayed by
+# `manage.py decay_trending_scores`, which should run every few minutes.
+
+TRENDING_GRAVITY = config('TRENDING_GRAVITY', default=1.8, cast=float)
+TRENDING_WINDOW_DAYS = config('TRENDING_WINDOW_DAYS', default=7, cast=int)
+
+
+# Post rendering
+# The fast path builds /posts/ and /posts/<id>/ bodies from .values() rows instead of
+# serializers; the output is identical, so this only exists as a kill switch.
+
+POST_FAST_RENDERING = config('POST_FAST_RENDERING', default=True, cast=bool)
+
+
+# Post export
+# GET /posts/export/ (staff only) streams NDJSON from a server-side cursor, POST_EXPORT_CHUNK_SIZE
+# rows at a time, so memory stays flat however many posts there are.
+
+POST_EXPORT_CHUNK_SIZE = config('POST_EXPORT_CHUNK_SIZE', default=1000, cast=int)
+
+
+# Post sync
+# GET /posts/changes/?since=<token> returns posts changed and deleted since the token. Rows newer
+# than POST_SYNC_SAFETY_LAG_SECONDS wait for the next call so transactions still committing are not
+# skipped. Deletions are kept as tombstones for POST_SYNC_TOMBSTONE_RETENTION_DAYS (older tokens get
+# 410); run `manage.py prune_post_tombstones` daily.
+
+POST_SYNC_SAFETY_LAG_SECONDS = config('POST_SYNC_SAFETY_LAG_SECONDS', default=5, cast=int)
+POST_SYNC_TOMBSTONE_RETENTION_DAYS = config('POST_SYNC_TOMBSTONE_RETENTION_DAYS', default=30, cast=int)
+
+
+# Request timing
+# Opt-in: adds a Server-Timing header (db, serialize, render, view) to every response and
+# logs one JSON line per request, as a warning when it runs more than REQUEST_QUERY_BUDGET queries.
+
+REQUEST_TIMING_ENABLED = config('REQUEST_TIMING_ENABLED', default=False, cast=bool)
+REQUEST_QUERY_BUDGET = config('REQUEST_QUERY_BUDGET', default=10, cast=int)
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+        },
+    },
+    'loggers': {
+        'core.middleware': {
+            'handlers': ['console'],
+            'level': 'INFO',
+            'propagate': False,
+        },
+    },
+}
+
+
+# Metrics
+# Prometheus metrics are served at /metrics. Under gunicorn set PROMETHEUS_MULTIPROC_DIR
+# so every worker writes to a shared directory that is merged on scrape (see gunicorn.conf.py).
+# Scrapes must send "Authorization: Bearer <METRICS_TOKEN>" over HTTPS like any other request;
+# METRICS_ENABLED without a token refuses to start.
+
+METRICS_ENABLED = config('METRICS_ENABLED', default=False, cast=bool)
+METRICS_TOKEN = config('METRICS_TOKEN', default='')
+
+
+# Password hashing
+# Register and login hash in a pool of PASSWORD_HASHING_PROCESSES child processes per worker
+# (0, the default, hashes inline). The pool only helps workers that serve other requests while
+# one waits, i.e. gunicorn with --threads or the ASGI mode; a sync worker just blocks on it.
+# Changing PASSWORD_PBKDF2_ITERATIONS is safe: stored hashes are upgraded on the user's next
+# successful login.
+
+PASSWORD_HASHERS = [
+    'core.hashers.TunedPBKDF2PasswordHasher',
+    'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+    'django.contrib.auth.hashers.Argon2PasswordHasher',
+    'django.contrib.auth.hashers.BCryptSHA256PasswordHasher',
+    'django.contrib.auth.hashers.ScryptPasswordHasher',
+]
+PASSWORD_PBKDF2_ITERATIONS = config('PASSWORD_PBKDF2_ITERATIONS', default=1_000_000, cast=int)
+PASSWORD_HASHING_PROCESSES = config('PASSWORD_HASHING_PROCESSES', default=0, cast=int)
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -194,6 +393,24 @@ else:
     MEDIA_ROOT = "/vol/web/media"
 
 
+# Post image storage
+# "flat" keeps uploads as-is in MEDIA_ROOT (variants under variants/), "content" stores images and
+# their variants as ab/cd/<sha256>.<ext> with deduplication; `manage.py migrate_image_storage`
+# moves existing files.
+
+POST_IMAGE_STORAGE = config('POST_IMAGE_STORAGE', default='flat')
+
+
+# Post image variants
+# Resized WebP/JPEG copies are generated in a bounded background pool after upload;
+# `manage.py generate_image_variants` backfills existing images.
+
+IMAGE_VARIANTS_ENABLED = config('IMAGE_VARIANTS_ENABLED', default=True, cast=bool)
+IMAGE_VARIANT_WIDTHS = (320, 800, 1600)
+IMAGE_VARIANT_WORKERS = config('IMAGE_VARIANT_WORKERS', default=2, cast=int)
+IMAGE_VARIANT_QUEUE_SIZE = config('IMAGE_VARIANT_QUEUE_SIZE', default=100, cast=int)
+
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
@@ -22,6 +22,8 @@ from django.views.generic import RedirectView
 from drf_yasg import openapi
 from drf_yasg.views import get_schema_view
 
+from core.views import metrics_view
+
 PROJECT_NAME = "TSU PostHub"
 
 schema_view = get_schema_view(
@@ -36,10 +38,13 @@ schema_view = get_schema_view(
 
 urlpatterns = [
     path('admin/', admin.site.urls),
+    path('metrics', metrics_view, name='metrics'),
     path('swagger/', schema_view.with_ui('swagger', cache_timeout=0), name='schema-swagger-ui'),
     path('auth/', include('apps.auth_app.urls')),
     path('profile/', include('apps.profile_app.urls')),
     path("posts/", include("apps.post_app.urls")),
+    path('async/profile/', include('apps.profile_app.urls_async')),
+    path("async/posts/", include("apps.post_app.urls_async")),
 
     path('', RedirectView.as_view(url='/swagger/', permanent=False)),
 ]
@@ -0,0 +1,15 @@
+﻿from django.core.cache import caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.exceptions import ImproperlyConfigured
+
+# Each gunicorn worker gets its own copy of these, so state written by one worker is invisible to the rest
+PROCESS_LOCAL_BACKENDS = (LocMemCache, DummyCache)
+
+
+def require_shared_cache(alias, setting_name):
+    if isinstance(caches[alias], PROCESS_LOCAL_BACKENDS):
+        raise ImproperlyConfigured(
+            f"{setting_name} points at the '{alias}' cache, which is local to each process. "
+            f"Configure a cache shared between workers, such as Redis or Memcached."
+        )
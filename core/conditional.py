@@ -0,0 +1,14 @@
+﻿from django.utils.cache import get_conditional_response, patch_vary_headers
+
+
+def conditional_response(request, etag):
+    response = get_conditional_response(request, etag=etag)
+    if response is not None:
+        set_validators(response, etag)
+    return response
+
+
+def set_validators(response, etag):
+    response["ETag"] = etag
+    patch_vary_headers(response, ("Authorization",))
+    return response
@@ -0,0 +1,55 @@
+﻿import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import caches
+
+# Replicas are opt-in per request, so commands, signals and background threads keep reading the primary
+_replica_reads = ContextVar("replica_reads", default=False)
+
+# Credentials and revoked tokens must never be served stale
+PRIMARY_ONLY_APPS = {"auth", "auth_app", "token_blacklist", "sessions"}
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        if not settings.DATABASE_REPLICAS or not _replica_reads.get():
+            return None
+        if model._meta.app_label in PRIMARY_ONLY_APPS:
+            return None
+        return random.choice(settings.DATABASE_REPLICAS)
+
+    def db_for_write(self, model, **hints):
+        return "default"
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db not in settings.DATABASE_REPLICAS
+
+
+@contextmanager
+def replica_reads(enabled=True):
+    token = _replica_reads.set(enabled)
+    try:
+        yield
+    finally:
+        _replica_reads.reset(token)
+
+
+def replica_reads_active():
+    return bool(settings.DATABASE_REPLICAS) and _replica_reads.get()
+
+
+def _pin_key(user_id):
+    return f"db:primary-pin:{user_id}"
+
+
+def pin_to_primary(user_id):
+    caches[settings.REPLICA_PIN_CACHE_ALIAS].set(_pin_key(user_id), True, timeout=settings.REPLICA_PIN_SECONDS)
+
+
+def is_pinned_to_primary(user_id):
+    return caches[settings.REPLICA_PIN_CACHE_ALIAS].get(_pin_key(user_id)) is not None
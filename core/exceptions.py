@@ -1,5 +1,7 @@
-﻿from rest_framework.exceptions import NotFound, ValidationError, NotAuthenticated, APIException, PermissionDenied, \
-    AuthenticationFailed
+﻿import math
+
+from rest_framework.exceptions import NotFound, ValidationError, NotAuthenticated, APIException, PermissionDenied, \
+    AuthenticationFailed, Throttled
 from rest_framework import status
 from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
 
@@ -48,6 +50,17 @@ def custom_exception_handler(exc, context):
             exc.detail
         )
 
+    if isinstance(exc, Throttled):
+        response = ErrorResponseMixin.format_error(
+            request,
+            status.HTTP_429_TOO_MANY_REQUESTS,
+            "Too Many Requests",
+            str(exc.detail)
+        )
+        if exc.wait is not None:
+            response['Retry-After'] = str(math.ceil(exc.wait))
+        return response
+
     if isinstance(exc, APIException):
         return ErrorResponseMixin.format_error(
             request,
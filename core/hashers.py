@@ -0,0 +1,89 @@
+﻿import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from django.conf import settings
+from django.contrib.auth.hashers import PBKDF2PasswordHasher, make_password, verify_password
+
+
+class TunedPBKDF2PasswordHasher(PBKDF2PasswordHasher):
+    # Same algorithm name, so existing hashes still verify and must_update flags the ones
+    # stored with a different iteration count for rehash on the next login
+    @property
+    def iterations(self):
+        return settings.PASSWORD_PBKDF2_ITERATIONS
+
+
+def _setup_worker():
+    import django
+
+    django.setup()
+
+
+def _hash(password):
+    return make_password(password)
+
+
+def _verify(password, encoded):
+    is_correct, must_update = verify_password(password, encoded)
+    return is_correct, make_password(password) if is_correct and must_update else None
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                # spawn, not fork: gunicorn workers may be threaded, and forked children inherit held locks
+                _executor = ProcessPoolExecutor(
+                    max_workers=settings.PASSWORD_HASHING_PROCESSES,
+                    mp_context=multiprocessing.get_context("spawn"),
+                    initializer=_setup_worker,
+                )
+    return _executor
+
+
+def _reset_executor(broken):
+    global _executor
+    with _executor_lock:
+        if _executor is broken:
+            _executor = None
+    broken.shutdown(wait=False, cancel_futures=True)
+
+
+def _run(function, *args):
+    if settings.PASSWORD_HASHING_PROCESSES <= 0:
+        return function(*args)
+    executor = _get_executor()
+    try:
+        return executor.submit(function, *args).result()
+    except BrokenProcessPool:
+        # A killed child breaks the whole pool; start a new one next time and answer this call inline
+        _reset_executor(executor)
+        return function(*args)
+
+
+def warm_up():
+    # Spawning the children and running django.setup() takes seconds; start it before the first login
+    if settings.PASSWORD_HASHING_PROCESSES > 0:
+        executor = _get_executor()
+        for _ in range(settings.PASSWORD_HASHING_PROCESSES):
+            executor.submit(_setup_worker)
+
+
+def set_password(user, raw_password):
+    user.password = _run(_hash, raw_password)
+    user._password = raw_password
+
+
+def check_password(user, raw_password):
+    is_correct, rehashed = _run(_verify, raw_password, user.password)
+    if rehashed is not None:
+        user.password = rehashed
+        user.save(update_fields=["password"])
+    return is_correct
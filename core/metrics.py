@@ -0,0 +1,103 @@
+﻿import os
+
+from django.conf import settings
+from django.db import connections
+from prometheus_client import REGISTRY, CollectorRegistry, Counter, Gauge, Histogram, generate_latest, multiprocess
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 34, 55)
+
+REQUESTS = Counter(
+    "http_requests_total", "HTTP requests by view, method and status", ["view", "method", "status"]
+)
+REQUEST_LATENCY = Histogram(
+    "http_request_duration_seconds", "HTTP request latency", ["view", "method"], buckets=LATENCY_BUCKETS
+)
+RESPONSE_SIZE = Histogram(
+    "http_response_size_bytes", "HTTP response body size", ["view"], buckets=SIZE_BUCKETS
+)
+REQUEST_ERRORS = Counter(
+    "http_request_errors_total", "HTTP responses with a 4xx or 5xx status", ["view", "status"]
+)
+DB_QUERIES = Histogram(
+    "http_request_db_queries", "Database queries executed per request", ["view"], buckets=QUERY_BUCKETS
+)
+POST_LIKES = Counter("post_likes_total", "Successful post like and unlike actions", ["action"])
+LOGIN_THROTTLED = Counter(
+    "login_throttled_total", "Login attempts rejected before the password check", ["scope"]
+)
+
+DB_POOL_CONNECTIONS = Gauge(
+    "db_pool_connections", "Connections held by the pool", ["alias"], multiprocess_mode="livesum"
+)
+DB_POOL_AVAILABLE = Gauge(
+    "db_pool_available_connections", "Idle connections in the pool", ["alias"], multiprocess_mode="livesum"
+)
+DB_POOL_WAITING = Gauge(
+    "db_pool_waiting_requests", "Requests waiting for a connection", ["alias"], multiprocess_mode="livesum"
+)
+DB_POOL_REQUESTS = Counter("db_pool_requests_total", "Connection requests made to the pool", ["alias"])
+DB_POOL_QUEUED = Counter(
+    "db_pool_requests_queued_total", "Connection requests that had to wait for a connection", ["alias"]
+)
+DB_POOL_WAIT = Counter(
+    "db_pool_wait_seconds_total", "Total time spent waiting for a pooled connection", ["alias"]
+)
+DB_POOL_ERRORS = Counter(
+    "db_pool_requests_errors_total", "Connection requests that timed out or failed", ["alias"]
+)
+
+
+def get_view_label(request):
+    match = request.resolver_match
+    return match.view_name if match is not None else "unmatched"
+
+
+def observe_request(request, response, duration, queries):
+    view = get_view_label(request)
+    status = str(response.status_code)
+    REQUESTS.labels(view, request.method, status).inc()
+    REQUEST_LATENCY.labels(view, request.method).observe(duration)
+    DB_QUERIES.labels(view).observe(queries)
+    if not response.streaming:
+        RESPONSE_SIZE.labels(view).observe(len(response.content))
+    if response.status_code >= 400:
+        REQUEST_ERRORS.labels(view, status).inc()
+
+
+def observe_pool_stats():
+    for connection in connections.all():
+        pool = getattr(connection, "pool", None)
+        if pool is None:
+            continue
+        # pop_stats() resets the pool's counters, so each call only reports what happened since the last one
+        stats = pool.pop_stats()
+        alias = connection.alias
+        DB_POOL_CONNECTIONS.labels(alias).set(stats.get("pool_size", 0))
+        DB_POOL_AVAILABLE.labels(alias).set(stats.get("pool_available", 0))
+        DB_POOL_WAITING.labels(alias).set(stats.get("requests_waiting", 0))
+        DB_POOL_REQUESTS.labels(alias).inc(stats.get("requests_num", 0))
+        DB_POOL_QUEUED.labels(alias).inc(stats.get("requests_queued", 0))
+        DB_POOL_WAIT.labels(alias).inc(stats.get("requests_wait_ms", 0) / 1000)
+        DB_POOL_ERRORS.labels(alias).inc(stats.get("requests_errors", 0))
+
+
+def record_like(action):
+    if settings.METRICS_ENABLED:
+        POST_LIKES.labels(action).inc()
+
+
+def record_login_throttled(scope):
+    if settings.METRICS_ENABLED:
+        LOGIN_THROTTLED.labels(scope=scope).inc()
+
+
+def render_metrics():
+    # Under gunicorn every worker writes its own files; merge them at scrape time
+    if "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry)
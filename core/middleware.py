@@ -0,0 +1,107 @@
+﻿import json
+import logging
+import time
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured, MiddlewareNotUsed
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+
+from core.caches import require_shared_cache
+from core.db_router import is_pinned_to_primary, pin_to_primary, replica_reads
+
+from core.metrics import observe_pool_stats, observe_request
+from core.timing import RequestTiming, activate, deactivate, timed, track_queries
+
+logger = logging.getLogger(__name__)
+
+
+class RequestTimingMiddleware:
+    def __init__(self, get_response):
+        if not settings.REQUEST_TIMING_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        timing = RequestTiming()
+        token = activate(timing)
+        try:
+            with track_queries(timing), timed("view"):
+                response = self.get_response(request)
+        finally:
+            deactivate(token)
+
+        response["Server-Timing"] = timing.server_timing()
+        self.log(request, response, timing)
+        return response
+
+    @staticmethod
+    def log(request, response, timing):
+        over_budget = timing.queries > settings.REQUEST_QUERY_BUDGET
+        record = {
+            "method": request.method,
+            "path": request.path,
+            "view": request.resolver_match.view_name if request.resolver_match else None,
+            "status": response.status_code,
+            **timing.as_dict(),
+            "over_budget": over_budget,
+        }
+        level = logging.WARNING if over_budget else logging.INFO
+        logger.log(level, json.dumps(record), extra={"timing": record})
+
+
+class MetricsMiddleware:
+    def __init__(self, get_response):
+        if not settings.METRICS_ENABLED:
+            raise MiddlewareNotUsed
+        # Labels carry view names and traffic volumes, which are not for the public internet
+        if not settings.METRICS_TOKEN:
+            raise ImproperlyConfigured("METRICS_ENABLED requires METRICS_TOKEN, the bearer token /metrics is scraped with.")
+        self.get_response = get_response
+
+    def __call__(self, request):
+        timing = RequestTiming()
+        started = time.perf_counter()
+        with track_queries(timing):
+            response = self.get_response(request)
+        observe_request(request, response, time.perf_counter() - started, timing.queries)
+        observe_pool_stats()
+        return response
+
+
+class ReplicaRoutingMiddleware:
+    def __init__(self, get_response):
+        if not settings.DATABASE_REPLICAS:
+            raise MiddlewareNotUsed
+        # Pins written by one worker have to be seen by the worker serving the next read
+        require_shared_cache(settings.REPLICA_PIN_CACHE_ALIAS, "REPLICA_PIN_CACHE_ALIAS")
+        self.get_response = get_response
+        self.authentication = JWTAuthentication()
+
+    def __call__(self, request):
+        if request.method not in SAFE_METHODS:
+            response = self.get_response(request)
+            # DRF mirrors the authenticated user onto the Django request
+            user = getattr(request, "user", None)
+            if user is not None and user.is_authenticated and response.status_code < 400:
+                pin_to_primary(user.pk)
+            return response
+
+        user_id = self.get_token_user_id(request)
+        with replica_reads(user_id is None or not is_pinned_to_primary(user_id)):
+            return self.get_response(request)
+
+    def get_token_user_id(self, request):
+        # Signature check only; the user itself is loaded later by the view's authenticator
+        header = self.authentication.get_header(request)
+        if header is None:
+            return None
+        try:
+            raw_token = self.authentication.get_raw_token(header)
+            if raw_token is None:
+                return None
+            return self.authentication.get_validated_token(raw_token).get(jwt_settings.USER_ID_CLAIM)
+        except (InvalidToken, TokenError):
+            return None
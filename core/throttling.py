@@ -0,0 +1,170 @@
+﻿import hashlib
+import random
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from rest_framework.exceptions import Throttled
+from rest_framework.throttling import BaseThrottle
+
+from core.metrics import record_login_throttled
+
+PERIODS = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+PRUNE_PROBABILITY = 0.01
+
+
+def parse_rate(rate):
+    # Same "<count>/<period>" format as DRF's DEFAULT_THROTTLE_RATES
+    count, period = rate.split("/")
+    return int(count), PERIODS[period[0]]
+
+
+# SQLite file shared by every worker on the host; counts live in fixed buckets and the
+# previous bucket is weighted by how much of it still overlaps the sliding window
+class SlidingWindowStore:
+    def __init__(self):
+        self._local = threading.local()
+
+    def _connection(self):
+        path = str(settings.LOGIN_THROTTLE_DB)
+        connection = getattr(self._local, "connection", None)
+        if connection is None or self._local.path != path:
+            connection = sqlite3.connect(path, timeout=5, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS throttle_hits ("
+                "key TEXT NOT NULL, bucket INTEGER NOT NULL, count INTEGER NOT NULL, "
+                "expires_at REAL NOT NULL, PRIMARY KEY (key, bucket))"
+            )
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS throttle_trusted (key TEXT PRIMARY KEY, expires_at REAL NOT NULL)"
+            )
+            self._local.connection, self._local.path = connection, path
+        return connection
+
+    # Counts the hit only if it fits under the limit; returns 0 if it did, else the seconds to wait
+    def hit(self, key, limit, window, now=None):
+        now = time.time() if now is None else now
+        position = now / window
+        bucket = int(position)
+
+        connection = self._connection()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            counts = dict(connection.execute(
+                "SELECT bucket, count FROM throttle_hits WHERE key = ? AND bucket IN (?, ?)",
+                (key, bucket - 1, bucket),
+            ).fetchall())
+            previous, current = counts.get(bucket - 1, 0), counts.get(bucket, 0)
+            admitted = previous * (1 - (position - bucket)) + current < limit
+            if admitted:
+                connection.execute(
+                    "INSERT INTO throttle_hits (key, bucket, count, expires_at) VALUES (?, ?, 1, ?) "
+                    "ON CONFLICT (key, bucket) DO UPDATE SET count = count + 1",
+                    (key, bucket, (bucket + 2) * window),
+                )
+                wait = 0
+            elif current < limit:
+                wait = (bucket + 1 - (limit - current) / previous - position) * window
+            else:
+                wait = (bucket + 2 - limit / current - position) * window
+            connection.execute("COMMIT")
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+
+        if random.random() < PRUNE_PROBABILITY:
+            connection.execute("DELETE FROM throttle_hits WHERE expires_at < ?", (now,))
+            connection.execute("DELETE FROM throttle_trusted WHERE expires_at < ?", (now,))
+        return 0 if admitted else max(wait, 0.001)
+
+    def trust(self, key, timeout):
+        self._connection().execute(
+            "INSERT INTO throttle_trusted (key, expires_at) VALUES (?, ?) "
+            "ON CONFLICT (key) DO UPDATE SET expires_at = excluded.expires_at",
+            (key, time.time() + timeout),
+        )
+
+    def is_trusted(self, key):
+        row = self._connection().execute(
+            "SELECT 1 FROM throttle_trusted WHERE key = ? AND expires_at > ?", (key, time.time())
+        ).fetchone()
+        return row is not None
+
+
+throttle_store = SlidingWindowStore()
+
+
+def _email_digest(email):
+    return hashlib.sha256(email.strip().lower().encode()).hexdigest()
+
+
+def _trusted_key(email, ident):
+    return f"login:trusted:{_email_digest(email)}:{ident}"
+
+
+class LoginRateThrottle(BaseThrottle):
+    def get_limits(self, request):
+        ident = self.get_ident(request)
+        limits = [("ip", f"login:ip:{ident}", settings.LOGIN_THROTTLE_IP_RATE)]
+        email = request.data.get("email") if hasattr(request.data, "get") else None
+        if not isinstance(email, str) or not email.strip():
+            return limits + [("global", "login:global", settings.LOGIN_THROTTLE_GLOBAL_RATE)]
+        # A pair that logged in successfully before is not what an attack looks like, so it
+        # keeps working while the email and global budgets are exhausted
+        if throttle_store.is_trusted(_trusted_key(email, ident)):
+            return limits
+        return limits + [
+            ("email", f"login:email:{_email_digest(email)}", settings.LOGIN_THROTTLE_EMAIL_RATE),
+            ("global", "login:global", settings.LOGIN_THROTTLE_GLOBAL_RATE),
+        ]
+
+    def allow_request(self, request, view):
+        self._wait = None
+        if not settings.LOGIN_THROTTLE_ENABLED:
+            return True
+        # Checked in order and stopped at the first refusal, so a blocked IP can't drain the
+        # email and global budgets that legitimate users share
+        for scope, key, rate in self.get_limits(request):
+            limit, window = parse_rate(rate)
+            wait = throttle_store.hit(key, limit, window)
+            if wait:
+                record_login_throttled(scope)
+                self._wait = wait
+                return False
+        return True
+
+    def wait(self):
+        return self._wait
+
+    def trust(self, request, email):
+        if settings.LOGIN_THROTTLE_ENABLED:
+            throttle_store.trust(_trusted_key(email, self.get_ident(request)), settings.LOGIN_THROTTLE_TRUST_SECONDS)
+
+
+_password_checks = None
+_password_checks_lock = threading.Lock()
+
+
+def _password_check_semaphore():
+    global _password_checks
+    if _password_checks is None:
+        with _password_checks_lock:
+            if _password_checks is None:
+                _password_checks = threading.BoundedSemaphore(settings.LOGIN_MAX_CONCURRENT_PASSWORD_CHECKS)
+    return _password_checks
+
+
+@contextmanager
+def password_check_slot():
+    semaphore = _password_check_semaphore()
+    if not semaphore.acquire(timeout=settings.LOGIN_PASSWORD_CHECK_WAIT_SECONDS):
+        record_login_throttled("concurrency")
+        raise Throttled(wait=settings.LOGIN_PASSWORD_CHECK_WAIT_SECONDS)
+    try:
+        yield
+    finally:
+        semaphore.release()
@@ -0,0 +1,65 @@
+﻿import time
+from collections import defaultdict
+from contextlib import ExitStack, contextmanager
+from contextvars import ContextVar
+
+from django.db import connections
+
+_current_timing = ContextVar("request_timing", default=None)
+
+
+class RequestTiming:
+    def __init__(self):
+        self.queries = 0
+        self.durations = defaultdict(float)
+
+    def track_query(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries += 1
+            self.durations["db"] += time.perf_counter() - started
+
+    def as_dict(self):
+        data = {"queries": self.queries}
+        data.update({f"{name}_ms": round(seconds * 1000, 2) for name, seconds in self.durations.items()})
+        return data
+
+    def server_timing(self):
+        metrics = []
+        for name, seconds in self.durations.items():
+            metric = f"{name};dur={seconds * 1000:.1f}"
+            if name == "db":
+                metric += f';desc="{self.queries} queries"'
+            metrics.append(metric)
+        return ", ".join(metrics)
+
+
+@contextmanager
+def track_queries(timing):
+    with ExitStack() as stack:
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(timing.track_query))
+        yield timing
+
+
+def activate(timing):
+    return _current_timing.set(timing)
+
+
+def deactivate(token):
+    _current_timing.reset(token)
+
+
+@contextmanager
+def timed(name):
+    timing = _current_timing.get()
+    if timing is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        timing.durations[name] += time.perf_counter() - started
@@ -0,0 +1,126 @@
+﻿import hashlib
+import math
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.utils import timezone
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken
+from rest_framework_simplejwt.tokens import RefreshToken
+
+BLACKLIST_FILTER_ERROR_RATE = 0.01
+# Ids are handed out before commit, so an incremental load re-reads a few below the last one it saw
+BLACKLIST_FILTER_ID_OVERLAP = 100
+
+
+class BloomFilter:
+    def __init__(self, capacity, error_rate=BLACKLIST_FILTER_ERROR_RATE):
+        capacity = max(capacity, 1)
+        self.capacity = capacity
+        self.size = max(1024, math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hash_count = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, value):
+        # Kirsch-Mitzenmacher: k positions from two halves of one digest
+        digest = hashlib.blake2b(value.encode(), digest_size=16).digest()
+        first, second = int.from_bytes(digest[:8], "big"), int.from_bytes(digest[8:], "big") | 1
+        return ((first + i * second) % self.size for i in range(self.hash_count))
+
+    def add(self, value):
+        for position in self._positions(value):
+            self.bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, value):
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self._positions(value))
+
+
+class BlacklistFilter:
+    generation_key = "tokens:blacklist:generation"
+
+    def __init__(self):
+        self._filter = None
+        self._generation = None
+        self._last_id = 0
+        self._count = 0
+        self._built_at = 0.0
+        self._lock = threading.Lock()
+
+    @property
+    def cache(self):
+        return caches[settings.TOKEN_BLACKLIST_FILTER_CACHE_ALIAS]
+
+    def get_generation(self):
+        generation = self.cache.get(self.generation_key)
+        if generation is None:
+            self.cache.add(self.generation_key, time.time_ns(), timeout=None)
+            generation = self.cache.get(self.generation_key)
+        return generation
+
+    def invalidate(self):
+        # Other processes see the new generation on their next check and load the new rows
+        try:
+            self.cache.incr(self.generation_key)
+        except ValueError:
+            self.cache.add(self.generation_key, time.time_ns(), timeout=None)
+
+    def might_contain(self, jti):
+        generation = self.get_generation()
+        if self._filter is None or generation != self._generation or self._is_stale():
+            self._refresh(generation)
+        return jti in self._filter
+
+    def _is_stale(self):
+        return time.monotonic() - self._built_at > settings.TOKEN_BLACKLIST_FILTER_REFRESH_SECONDS
+
+    def _refresh(self, generation):
+        with self._lock:
+            if self._filter is None or self._is_stale():
+                self._rebuild(generation)
+            elif generation != self._generation:
+                self._extend(generation)
+
+    def _rebuild(self, generation):
+        # Expired tokens fail verification on their own, so only live ones need to be in the filter
+        rows = list(
+            BlacklistedToken.objects.filter(token__expires_at__gt=timezone.now()).values_list("id", "token__jti")
+        )
+        # Room for the tokens blacklisted until the next periodic rebuild
+        bloom = BloomFilter(max(2 * len(rows), 1024))
+        for _, jti in rows:
+            bloom.add(jti)
+        self._filter, self._generation, self._built_at = bloom, generation, time.monotonic()
+        self._count, self._last_id = len(rows), max((row_id for row_id, _ in rows), default=0)
+
+    def _extend(self, generation):
+        rows = list(
+            BlacklistedToken.objects.filter(id__gt=self._last_id - BLACKLIST_FILTER_ID_OVERLAP)
+            .values_list("id", "token__jti")
+        )
+        new_ids = [row_id for row_id, _ in rows if row_id > self._last_id]
+        if self._count + len(new_ids) > self._filter.capacity:
+            return self._rebuild(generation)
+        # Setting bits in place is safe for readers, they can only gain members
+        for _, jti in rows:
+            self._filter.add(jti)
+        self._count, self._last_id = self._count + len(new_ids), max(new_ids, default=self._last_id)
+        self._generation = generation
+
+
+blacklist_filter = BlacklistFilter()
+
+
+class FilteredRefreshToken(RefreshToken):
+    def check_blacklist(self):
+        if not settings.TOKEN_BLACKLIST_FILTER_ENABLED:
+            return super().check_blacklist()
+
+        jti = self.payload[api_settings.JTI_CLAIM]
+        if not blacklist_filter.might_contain(jti):
+            return
+        if BlacklistedToken.objects.filter(token__jti=jti).exists():
+            raise TokenError(_("Token is blacklisted"))
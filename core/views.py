@@ -0,0 +1,63 @@
+﻿from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.http import Http404, HttpResponse
+from django.utils.crypto import constant_time_compare
+from django.views import View
+from prometheus_client import CONTENT_TYPE_LATEST
+from rest_framework.exceptions import NotAuthenticated, NotFound, PermissionDenied, MethodNotAllowed
+from rest_framework.request import Request
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+
+from core.metrics import render_metrics
+from core.renderers import FastJSONRenderer
+
+
+class AsyncAPIView(View):
+    http_method_names = ["get", "head", "options"]
+    permission_classes = api_settings.DEFAULT_PERMISSION_CLASSES
+
+    async def dispatch(self, request, *args, **kwargs):
+        request = Request(
+            request, authenticators=[auth() for auth in api_settings.DEFAULT_AUTHENTICATION_CLASSES]
+        )
+        try:
+            # Authenticators are sync and may hit the DB, so resolve the user off the event loop
+            await sync_to_async(getattr)(request, "user")
+            self.check_permissions(request)
+            handler = getattr(self, request.method.lower(), None)
+            if request.method.lower() not in self.http_method_names or handler is None:
+                raise MethodNotAllowed(request.method)
+            response = await handler(request, *args, **kwargs)
+        except Exception as exc:
+            response = self.handle_exception(request, exc)
+        return self.finalize_response(request, response)
+
+    def check_permissions(self, request):
+        for permission in [permission() for permission in self.permission_classes]:
+            if not permission.has_permission(request, self):
+                if not request.user.is_authenticated:
+                    raise NotAuthenticated()
+                raise PermissionDenied(getattr(permission, "message", None))
+
+    def handle_exception(self, request, exc):
+        if isinstance(exc, Http404):
+            exc = NotFound(*exc.args)
+        return api_settings.EXCEPTION_HANDLER(exc, {"request": request, "view": self})
+
+    def finalize_response(self, request, response):
+        if isinstance(response, Response):
+            response.accepted_renderer = FastJSONRenderer()
+            response.accepted_media_type = response.accepted_renderer.media_type
+            response.renderer_context = {"request": request, "view": self, "response": response}
+        return response
+
+
+def metrics_view(request):
+    if not settings.METRICS_ENABLED or not settings.METRICS_TOKEN:
+        raise Http404
+    if not constant_time_compare(
+        request.headers.get("Authorization", ""), f"Bearer {settings.METRICS_TOKEN}"
+    ):
+        return HttpResponse(status=401)
+    return HttpResponse(render_metrics(), content_type=CONTENT_TYPE_LATEST)
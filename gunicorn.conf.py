@@ -0,0 +1,32 @@
+import glob
+import os
+
+# SERVER_MODE=asgi serves config.asgi under uvicorn workers, so the /async/ read views
+# can wait on Postgres without holding the worker; the default stays sync WSGI
+if os.environ.get("SERVER_MODE", "wsgi") == "asgi":
+    wsgi_app = "config.asgi:application"
+    worker_class = "uvicorn_worker.UvicornWorker"
+else:
+    wsgi_app = "config.wsgi:application"
+
+
+def on_starting(server):
+    # Files left by a previous master would otherwise be merged into the new counters
+    path = os.environ.get("PROMETHEUS_MULTIPROC_DIR")
+    if path:
+        os.makedirs(path, exist_ok=True)
+        for name in glob.glob(os.path.join(path, "*.db")):
+            os.remove(name)
+
+
+def child_exit(server, worker):
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        from prometheus_client import multiprocess
+
+        multiprocess.mark_process_dead(worker.pid)
+
+
+def post_worker_init(worker):
+    from core.hashers import warm_up
+
+    warm_up()